@@ -0,0 +1,78 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import metrics
+
+
+class _BodyTooLarge(HTTPException):
+    # an HTTPException, so FastAPI's form parsing re-raises it as is
+    # (anything else it reports as a 400 "error parsing the body")
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit} bytes.")
+
+
+class RequestBodyLimitMiddleware:
+    """
+    Caps the request body of the given POST paths before the endpoint parses
+    it. Starlette reads a whole multipart body (to its own temporary files)
+    before an UploadFile reaches the endpoint, so a limit checked there only
+    applies once everything has been received. Here a declared Content-Length
+    over the limit is rejected without reading the body, and a body that
+    turns out longer (chunked, or an understated length) is cut off with a
+    413 as soon as it crosses the limit.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = self.limits.get(scope["path"].rstrip("/"))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.increment("requests.body_too_large")
+                    raise _BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            # raised outside the endpoint's exception handling
+            if response_started:
+                raise
+            await self._reject(scope, receive, send, limit)
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, limit: int):
+        metrics.increment("requests.body_too_large")
+        response = JSONResponse(
+            {"detail": f"Request body exceeds {limit} bytes."},
+            status_code=413,
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.utils import metrics
+
+T = TypeVar("T")
+
+# nginx's "client closed request"; only ends up in access logs
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _wait_for_disconnect(request: Request):
+    # the body has already been read, so the next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Awaits `work`, cancelling it if the client disconnects first (Starlette
+    does not cancel a plain endpoint when its client goes away, so a long
+    generation would otherwise run to the end for nobody).
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+
+        task.cancel()
+        metrics.increment("requests.cancelled_on_disconnect")
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        watcher.cancel()
+        if not task.done():  # this endpoint itself was cancelled
+            task.cancel()
@@ -7,6 +7,7 @@ from app.api.v1.endpoints import (
     notifications,
     activity,
     trash,
+    metrics,
 )
 
 api_router = APIRouter()
@@ -48,3 +49,9 @@ api_router.include_router(
     prefix="/trash",
     tags=["Trash"],
 )
+
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["Metrics"],
+)
@@ -1,10 +1,11 @@
 from typing import Annotated, List
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from app.auth import get_current_user
 from app.schemas.assessment_request import AssessmentRequest
 from app.schemas.assessment import AssessmentSchema, AssessmentDetails
 from app.schemas.assessment_attempt import AssessmentAttemptRequest
 
+from app.api.cancellation import run_until_disconnect
 from app.api.dependencies import get_assessment_service
 from app.services.assessment_service import AssessmentService
 
@@ -14,6 +15,7 @@ router = APIRouter()
 @router.post("", response_model=str)
 async def generate_assessment(
     request: AssessmentRequest,
+    http_request: Request,
     current_user: Annotated[dict, Depends(get_current_user)],
     assessment_service: AssessmentService = Depends(get_assessment_service),
 ):
@@ -23,15 +25,19 @@ async def generate_assessment(
     # create the record in Supabase immediately
     assessment_id = await assessment_service.create_pending_record(request, user_id)
 
-    # await the heavy task directly (Google Cloud Run request-based billing)
-    await assessment_service.generate_assessment(
-        assessment_id=assessment_id,
-        document_ids=request.document_ids,
-        query=request.query,
-        user_id=user_id,
-        num_questions=request.num_questions,
-        question_types=request.question_types,
-        difficulty=request.difficulty,
+    # await the heavy task directly (Google Cloud Run request-based billing);
+    # it is cancelled if the client disconnects
+    await run_until_disconnect(
+        http_request,
+        assessment_service.generate_assessment(
+            assessment_id=assessment_id,
+            document_ids=request.document_ids,
+            query=request.query,
+            user_id=user_id,
+            num_questions=request.num_questions,
+            question_types=request.question_types,
+            difficulty=request.difficulty,
+        ),
     )
 
     # return the ID
@@ -20,6 +20,7 @@ class QueryRequest(BaseModel):
     prompt: str
     document_id: str
     top_k: int = 5
+    ef_search: int | None = None  # HNSW candidate list size for this query
 
 
 APP_ENV = os.getenv("APP_ENV", "production")
@@ -74,9 +75,10 @@ if APP_ENV == "development":
         # filtering by user_id AND document_id
         raw_results = await vector_service.query(
             data=query_vector,
-            limit=request.top_k,
+            chunks=request.top_k,
             include_value=True,
             filters=filters,
+            ef_search=request.ef_search,
         )
 
         # raw_results is a list of objects or tuples; we map them to dicts
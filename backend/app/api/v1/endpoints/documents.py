@@ -44,6 +44,33 @@ async def upload_pdf(
         ) from e
 
 
+@router.post("/batch")
+async def upload_batch(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    files: list[UploadFile] = File(...),
+    upload_service: UploadService = Depends(get_upload_service),
+):
+    """
+    Endpoint to upload many PDF/PPTX files in one multipart request.
+    - files: The file binaries (repeat the `files` form field).
+    Returns a result per file, in order; one bad file does not fail the batch.
+    """
+    try:
+        user_id = current_user["user_id"]
+        return await upload_service.execute_batch(
+            files=files,
+            user_id=user_id,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Batch Upload Error: {e}")
+        raise HTTPException(
+            status_code=500, detail="Internal Server Error during batch upload."
+        ) from e
+
+
 @router.get("")
 async def get_documents(
     current_user: Annotated[dict, Depends(get_current_user)],
@@ -92,6 +119,28 @@ async def delete_document(
         ) from e
 
 
+@router.get("/{document_id}/status")
+async def get_document_status(
+    document_id: str,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    document_service: DocumentService = Depends(get_document_service),
+):
+    """
+    Ingestion status for a document: its processing state and, when uploads
+    are queued, the latest ingestion job (attempts, next retry, last error).
+    """
+    try:
+        user_id = current_user["user_id"]
+        return await document_service.get_document_status(document_id, user_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error getting document status {e}")
+        raise HTTPException(
+            status_code=500, detail="Internal Server Error during getting document status"
+        ) from e
+
+
 @router.get("/{document_id}/preview")
 async def view_document(
     document_id: str,
@@ -0,0 +1,56 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends
+from app.auth import get_current_user
+from app.api.dependencies import (
+    get_assessment_service,
+    get_embedding_service,
+    get_vector_service,
+)
+from app.services.assessment_service import AssessmentService
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_db_service import VectorDBService
+from app.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_metrics(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorDBService = Depends(get_vector_service),
+    assessment_service: AssessmentService = Depends(get_assessment_service),
+):
+    """
+    Returns the process-wide counters along with derived rates.
+    Counters are per instance and reset when the process restarts.
+    """
+    return {
+        "counters": metrics.snapshot(),
+        "rates": {
+            "uploads.dedup_fast_path": metrics.ratio(
+                "uploads.dedup_fast_path", "uploads.total"
+            ),
+            "embedding_store.hits": metrics.ratio(
+                "embedding_store.hits", "embedding_store.lookups"
+            ),
+            "embedding_cache.hits": metrics.ratio(
+                "embedding_cache.hits", "embedding_cache.lookups"
+            ),
+            "retrieval_cache.hits": metrics.ratio(
+                "retrieval_cache.hits", "retrieval_cache.lookups"
+            ),
+            # average milliseconds spent waiting for a pooled connection
+            "vector_pool.wait_ms": metrics.ratio(
+                "vector_pool.wait_ms", "vector_pool.acquires"
+            ),
+        },
+        "embedding_governor": embedding_service.governor.snapshot(),
+        "embedding_cache": embedding_service.cache.stats() if embedding_service.cache else None,
+        "vector_pool": vector_service.pool_stats(),
+        "retrieval_cache": (
+            assessment_service.retrieval_cache.stats()
+            if assessment_service.retrieval_cache
+            else None
+        ),
+    }
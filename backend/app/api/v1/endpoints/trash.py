@@ -1,5 +1,6 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
 from app.auth import get_current_user
 from app.api.dependencies import get_document_service, get_assessment_service
 from app.services.document_service import DocumentService
@@ -8,6 +9,11 @@ from app.services.assessment_service import AssessmentService
 router = APIRouter()
 
 
+class PurgeDocumentsRequest(BaseModel):
+    # None = every document in the user's trash
+    document_ids: list[str] | None = None
+
+
 # ──────────────────────────────────────────────
 # GET  /api/v1/trash
 # Returns all trashed documents + assessments
@@ -71,6 +77,32 @@ async def permanent_delete_document(
         )
 
 
+# ──────────────────────────────────────────────
+# POST /api/v1/trash/documents/purge
+# Permanently delete many (or all) trashed documents at once
+# ──────────────────────────────────────────────
+@router.post("/documents/purge")
+async def purge_documents(
+    body: PurgeDocumentsRequest,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    document_service: DocumentService = Depends(get_document_service),
+):
+    try:
+        user_id = current_user["user_id"]
+        result = await document_service.permanent_delete_documents(
+            body.document_ids, user_id
+        )
+        return {
+            "message": f"{len(result['deleted'])} document(s) permanently deleted.",
+            **result,
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error purging documents: {e}")
+        raise HTTPException(status_code=500, detail="Error purging documents")
+
+
 # ──────────────────────────────────────────────
 # POST /api/v1/trash/assessments/{id}/restore
 # ──────────────────────────────────────────────
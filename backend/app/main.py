@@ -1,25 +1,38 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
-from app.services.embedding_service import EmbeddingService
-from app.services.upload_service import UploadService
+from app.services.embedding_service import EMBEDDING_MODEL, EmbeddingService
+from app.services.embedding_store import EMBEDDING_STORE_ENABLED, EmbeddingStore
+from app.services.upload_service import (
+    MAX_BATCH_REQUEST_SIZE,
+    MAX_UPLOAD_REQUEST_SIZE,
+    UploadService,
+)
 from app.services.vector_db_service import VectorDBService
 from app.services.document_service import DocumentService
 from app.services.llm_service import LLMService
 from app.services.assessment_service import AssessmentService
 from app.services.activity_service import ActivityService
+from app.services.job_queue_service import JobQueueService
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from supabase import create_client
 
+from app.api.body_limit import RequestBodyLimitMiddleware
 from app.api.v1.api import api_router
 
 
 load_dotenv()
 
 
+def _report_index_check(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Vector index check failed: {task.exception()}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
@@ -38,11 +51,25 @@ async def lifespan(app: FastAPI):
 
     # initialize the services once for the entire application lifecycle.
     vector_service = VectorDBService(db_url=db_url)
-    embedding_service = EmbeddingService()
+    # verify (and create missing) chunk indexes in the background: a first
+    # HNSW build can take a while, and it is built concurrently, so requests
+    # are served (without the index) meanwhile
+    index_check = asyncio.create_task(asyncio.to_thread(vector_service.ensure_indexes))
+    index_check.add_done_callback(_report_index_check)
+    await vector_service.open()
+    # cross-document cache of chunk embeddings, used during ingestion
+    embedding_store = (
+        EmbeddingStore(vector_service.client, model=EMBEDDING_MODEL)
+        if EMBEDDING_STORE_ENABLED
+        else None
+    )
+    embedding_service = EmbeddingService(store=embedding_store)
+    job_queue_service = JobQueueService(db_client=supabase_service_client)
     upload_service = UploadService(
         vector_service=vector_service,
         db_client=supabase_service_client,  # Use the service role client for UploadService DB interactions
         embedding_service=embedding_service,
+        job_queue=job_queue_service,
     )
     document_service = DocumentService(supabase_service_client, vector_service) #not sure why this was removed
     llm_service = LLMService()
@@ -54,6 +81,9 @@ async def lifespan(app: FastAPI):
         db_client=supabase_service_client,
     )
 
+    # drop cached retrievals when the ingestion worker (re)writes chunks
+    await vector_service.listen_for_changes()
+
     activity_service = ActivityService(db_client=supabase_service_client)
 
     # store the service instances and Supabase clients in the application state.
@@ -64,6 +94,7 @@ async def lifespan(app: FastAPI):
     app.state.document_service = document_service
     app.state.assessment_service = assessment_service
     app.state.activity_service = activity_service
+    app.state.job_queue_service = job_queue_service
     app.state.supabase_service_client = (
         supabase_service_client  # Store the service role client
     )
@@ -72,11 +103,23 @@ async def lifespan(app: FastAPI):
 
     # --- Shutdown ---
     # Clean up the resources (e.g., close database connections).
+    if not index_check.done():
+        print("Shutting down while the vector index build is still running")
+    await vector_service.close()
     print("Shutdown complete. Resources cleaned up.")
 
 
 # Pass the lifespan manager to the FastAPI constructor
 app = FastAPI(title="AI Assessment Platform API", lifespan=lifespan)
+# oversized uploads are refused before their body is read (added before CORS,
+# so the 413 still carries CORS headers)
+app.add_middleware(
+    RequestBodyLimitMiddleware,
+    limits={
+        "/api/v1/documents": MAX_UPLOAD_REQUEST_SIZE,
+        "/api/v1/documents/batch": MAX_BATCH_REQUEST_SIZE,
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For production, replace "*" with your frontend URL
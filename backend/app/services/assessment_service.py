@@ -2,8 +2,10 @@ from typing import Dict, Any
 from uuid import uuid4
 from datetime import datetime, timezone
 from dateutil import parser
-import re
 import asyncio
+import math
+import os
+import re
 import random
 import logging
 import numpy as np
@@ -23,6 +25,10 @@ from app.services.document_service import DocumentService
 from app.services.embedding_service import EmbeddingService
 from app.services.vector_db_service import VectorDBService
 from app.services.llm_service import LLMService
+from app.services.retrieval_cache import RetrievalCache
+from app.utils import metrics
+from app.utils.context_packer import CONTEXT_TOKEN_BUDGET, format_sources, pack_context
+from app.utils.rate_governor import PRIORITY_INTERACTIVE
 
 
 from supabase import Client
@@ -36,6 +42,11 @@ SIMILARITY_THRESHOLDS = {
     "hard": 0.92,
 }
 
+# Retrieved chunks per (topic, documents, chunk count); entries
+# are dropped when the documents' chunks change. 0 entries disables it.
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2000"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+
 
 def cosine_similarity(vec_a: list[float], vec_b: list[float]) -> float:
     """Compute cosine similarity between two vectors."""
@@ -60,6 +71,16 @@ class AssessmentService:
         self.vector_service = vector_service
         self.db_client = db_client
         self.llm_service = llm_service  # import llm here
+        self.retrieval_cache = (
+            RetrievalCache(
+                max_entries=RETRIEVAL_CACHE_MAX_ENTRIES,
+                ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS,
+            )
+            if RETRIEVAL_CACHE_MAX_ENTRIES > 0
+            else None
+        )
+        if self.retrieval_cache is not None:
+            vector_service.add_change_listener(self.retrieval_cache.invalidate)
 
     async def get_assessment_details(
         self, assessment_id: str, user_id: str
@@ -280,10 +301,66 @@ class AssessmentService:
         """
         SPECIALIST: Just handles the RAG retrieval and formatting.
         """
+        contexts = await self.get_contexts_for_assessment(
+            [query], document_ids, chunks, user_id
+        )
+        return contexts[0]
+
+    async def get_contexts_for_assessment(
+        self,
+        topics: list[str],
+        document_ids: list[str],
+        chunks: int,
+        user_id: str,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+    ) -> list[str]:
+        """
+        Retrieves up to `chunks` chunks per topic and packs them into
+        `token_budget` tokens (see pack_context): duplicates across topics are
+        sent once and adjacent chunks are merged. One context per topic, with
+        SOURCE numbers running across topics.
+        """
+        retrieved = await self.retrieve_chunks(topics, document_ids, chunks)
+        packed = pack_context(retrieved, token_budget)
+
+        contexts = []
+        next_source = 1
+        for spans in packed:
+            contexts.append(format_sources(spans, start=next_source))
+            next_source += len(spans)
+
+        metrics.increment("context.chunks_retrieved", sum(len(r) for r in retrieved))
+        metrics.increment(
+            "context.chunks_sent", sum(len(s["chunk_ids"]) for spans in packed for s in spans)
+        )
+        metrics.increment("context.tokens_sent", sum(s["tokens"] for spans in packed for s in spans))
+        return contexts
+
+    async def retrieve_chunks(
+        self, topics: list[str], document_ids: list[str], chunks: int
+    ) -> list[list[dict]]:
+        """
+        Batched retrieval: one embedding request for all topics and one vector
+        search returning the top `chunks` per topic, as
+        {"id", "score", "metadata"} dicts (best first). Topics retrieved
+        recently for the same documents come from the cache.
+        """
+        cache = self.retrieval_cache
+        results = [None] * len(topics)
+        if cache is not None:
+            generation = cache.generation
+            keys = [cache.key(topic, document_ids, chunks) for topic in topics]
+            results = [cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
         # get embeddings
-        embedding = await self.embedding_service.embed_query(query)
-        if not embedding:
-            return ""
+        embeddings = await self.embedding_service.embed_queries(
+            [topics[i] for i in missing]
+        )
+        if not embeddings:
+            return [result or [] for result in results]
 
         #  query Vector DB ensure only documents that the user owns
         filters = {
@@ -292,40 +369,21 @@ class AssessmentService:
             ]
         }
 
-        retrieved_chunks = await self.vector_service.query(
-            embedding,
+        retrieved = await self.vector_service.query_many(
+            embeddings,
             chunks=chunks,
             filters=filters,
             include_value=True,
             include_metadata=True,
         )
-
-        valid_chunks = []
-        for item in retrieved_chunks:
-            distance = item[1]
-            similarity = 1 - distance
-
-            valid_chunks.append(
-                {"id": item[0], "score": similarity, "metadata": item[2]}
-            )
-
-        valid_chunks.sort(key=lambda x: x["score"], reverse=True)
-
-        # format the context for the LLM
-        formatted_context = []
-        for i, chunk in enumerate(valid_chunks):
-            metadata = chunk["metadata"]
-            text = metadata.get("text", "")
-            doc_id = metadata.get("document_id", "unknown")  # Get the ID from metadata
-            page_num = metadata.get("page_number")
-
-            if text:
-                # Adding 'Source' headers helps LLM cite its answers???
-                formatted_context.append(
-                    f"--- SOURCE {i + 1} (ID: {doc_id} | PAGE: {page_num}) ---\n{text.strip()}"
-                )
-
-        return "\n\n".join(formatted_context)
+        for i, rows in zip(missing, retrieved):
+            results[i] = [
+                {"id": row[0], "score": 1 - row[1], "metadata": row[2]} for row in rows
+            ]
+            # an empty result may be a failed query; not worth keeping
+            if cache is not None and results[i]:
+                cache.put(keys[i], results[i], generation)
+        return results
 
     async def _save_assessment_to_db(
         self, assessment_id: str, assessment_data: AssessmentSchema
@@ -402,7 +460,8 @@ class AssessmentService:
             if not document_ids:
                 raise ValueError("At least one document must be selected.")
 
-            total_chunks_limit = 35
+            # candidates per topic; what is sent is bounded by CONTEXT_TOKEN_BUDGET
+            max_chunks_per_topic = 35
 
             # split topics by comma
             topics = [t.strip() for t in query.split(",") if t.strip()]
@@ -410,23 +469,21 @@ class AssessmentService:
                 topics = [""]
             num_topics = len(topics)
             chunks_needed = num_questions * 3
-            min_floor = num_topics * 5
-            total_chunks = min(total_chunks_limit, max(min_floor, chunks_needed))
-            chunks_per_topic = total_chunks // num_topics
-
-            tasks = [
-                self.get_context_for_assessment(
-                    topic, document_ids, chunks_per_topic, user_id
-                )
-                for topic in topics
-            ]
+            chunks_per_topic = min(
+                max_chunks_per_topic, max(5, math.ceil(chunks_needed / num_topics))
+            )
 
-            contexts = await asyncio.gather(*tasks)
+            # all topics in one embedding call and one vector search, packed
+            # into the token budget
+            contexts = await self.get_contexts_for_assessment(
+                topics, document_ids, chunks_per_topic, user_id
+            )
 
             for i, ctx in enumerate(contexts):
                 if (
                     not ctx.strip()
                 ):  # won't raise an error, since this isn't a dealbreaker
+                    # (or all of its chunks are already under another topic)
                     print(f"Warning: No context found for topic: {topics[i]}")
 
             combined_context = "\n\n".join(
@@ -451,6 +508,12 @@ class AssessmentService:
                 print(f"Error from LLM service {e}")
                 await self.update_assessment_status(assessment_id, "failed", str(e))
 
+        except asyncio.CancelledError:
+            # the client went away (or the server is shutting down); don't
+            # leave the assessment in 'processing'
+            print(f"generate_assessment {assessment_id} cancelled")
+            await self.update_assessment_status(assessment_id, "failed", "Cancelled")
+            raise
         except Exception as e:
             print(f"Error in generate_assessment {assessment_id}: {e}")
             await self.update_assessment_status(assessment_id, "failed", str(e))
@@ -618,8 +681,11 @@ class AssessmentService:
                 correct_texts = [p[2] for p in sa_pairs]
                 all_texts = user_texts + correct_texts
 
-                # Single batch API call for all SA texts
-                embeddings = await self.embedding_service.embed_chunks(all_texts)
+                # Single batch API call for all SA texts (the student is waiting);
+                # reference and common answers repeat across attempts, so cached
+                embeddings = await self.embedding_service.embed_chunks(
+                    all_texts, priority=PRIORITY_INTERACTIVE, cache=True
+                )
 
                 n = len(sa_pairs)
                 for j, (idx, _, _) in enumerate(sa_pairs):
@@ -4,6 +4,7 @@ from dateutil import parser
 from fastapi import HTTPException
 
 from supabase import Client
+from app.services.upload_service import INGESTION_MODE
 from app.services.vector_db_service import VectorDBService
 
 
@@ -129,63 +130,132 @@ class DocumentService:
         and if no other users reference the document, also removes vectors,
         storage, and the document record.
         """
-        # Confirm the document is in the user's trash
-        check = (
+        result = await self.permanent_delete_documents([document_id], user_id)
+        if not result["deleted"]:
+            raise HTTPException(
+                status_code=404, detail="Document not found in trash"
+            )
+
+        return {
+            "message": "Document permanently deleted.",
+            "document_id": document_id,
+            "fully_deleted": document_id in result["fully_deleted"],
+        }
+
+    async def permanent_delete_documents(
+        self, document_ids: list[str] | None, user_id: str
+    ) -> dict:
+        """
+        Permanently delete several trashed documents of a user at once (all of
+        them when document_ids is None).  Same rules as permanent_delete_document,
+        but every step is one bulk call: the vectors of all documents no other
+        user references are removed with a single DELETE.
+        Documents not in the user's trash are ignored.
+        """
+        # Confirm which documents are in the user's trash
+        query = (
             self.db.table("user_library")
             .select("document_id")
             .eq("user_id", user_id)
-            .eq("document_id", document_id)
             .not_.is_("deleted_at", "null")
-            .maybe_single()
-            .execute()
         )
-        if not check.data:
-            raise HTTPException(
-                status_code=404, detail="Document not found in trash"
-            )
+        if document_ids is not None:
+            query = query.in_("document_id", document_ids)
+        trashed = [row["document_id"] for row in query.execute().data]
+        if not trashed:
+            return {"deleted": [], "fully_deleted": []}
 
-        # Remove this user's link (trashed row)
-        self.db.table("user_library").delete().eq("user_id", user_id).eq(
-            "document_id", document_id
+        # Remove this user's links (trashed rows)
+        self.db.table("user_library").delete().eq("user_id", user_id).in_(
+            "document_id", trashed
         ).execute()
 
-        # Check if any OTHER users still reference this document (active or trashed)
+        # Documents any OTHER user still references (active or trashed) stay
         remaining = (
             self.db.table("user_library")
             .select("document_id")
-            .eq("document_id", document_id)
+            .in_("document_id", trashed)
             .execute()
         )
+        still_referenced = {row["document_id"] for row in remaining.data}
+        orphaned = [doc_id for doc_id in trashed if doc_id not in still_referenced]
 
-        fully_deleted = False
-        if not remaining.data:
-            fully_deleted = True
-            await self.vector_service.delete_document_vectors(document_id)
+        if orphaned:
+            try:
+                await self.vector_service.purge_document_vectors(orphaned)
+            except Exception as e:
+                print(f"Vector delete warning: {e}")
 
             doc_response = (
                 self.db.table("documents")
                 .select("file_path")
-                .eq("id", document_id)
-                .maybe_single()
+                .in_("id", orphaned)
                 .execute()
             )
-            if doc_response and doc_response.data:
-                file_path = doc_response.data.get("file_path")
-                try:
-                    if file_path:
-                        self.db.storage.from_("pdfs").remove([file_path])
-                except Exception as e:
-                    print(f"Storage delete warning: {e}")
+            file_paths = [
+                row["file_path"] for row in doc_response.data if row.get("file_path")
+            ]
+            try:
+                if file_paths:
+                    self.db.storage.from_("pdfs").remove(file_paths)
+            except Exception as e:
+                print(f"Storage delete warning: {e}")
 
             try:
-                self.db.table("documents").delete().eq("id", document_id).execute()
+                self.db.table("documents").delete().in_("id", orphaned).execute()
             except Exception as e:
                 print(f"DB delete warning: {e}")
 
+        return {"deleted": trashed, "fully_deleted": orphaned}
+
+    async def get_document_status(self, document_id: str, user_id: str):
+        """
+        Returns the processing status of a document in the user's library,
+        along with its most recent ingestion job (when queue mode is used).
+        """
+        result = (
+            self.db.table("user_library")
+            .select("document_id, documents(status, page_count)")
+            .eq("document_id", document_id)
+            .eq("user_id", user_id)
+            .is_("deleted_at", "null")
+            .maybe_single()
+            .execute()
+        )
+
+        if not (result and result.data and result.data.get("documents")):
+            raise HTTPException(status_code=404, detail="Document not found for user")
+
+        job = None
+        # the ingestion_jobs table only has to exist in queue mode
+        if INGESTION_MODE == "queue":
+            job_res = (
+                self.db.table("ingestion_jobs")
+                .select("id, status, attempts, max_attempts, run_after, last_error, updated_at")
+                .eq("document_id", document_id)
+                .order("created_at", desc=True)
+                .limit(1)
+                .execute()
+            )
+            job = job_res.data[0] if job_res.data else None
+
         return {
-            "message": "Document permanently deleted.",
-            "document_id": document_id,
-            "fully_deleted": fully_deleted,
+            "id": document_id,
+            "status": result.data["documents"].get("status"),
+            "pageCount": result.data["documents"].get("page_count", 0),
+            "job": (
+                {
+                    "id": job["id"],
+                    "status": job["status"],
+                    "attempts": job["attempts"],
+                    "maxAttempts": job["max_attempts"],
+                    "nextRunAt": job["run_after"] if job["status"] == "queued" else None,
+                    "lastError": job.get("last_error"),
+                    "updatedAt": job.get("updated_at"),
+                }
+                if job
+                else None
+            ),
         }
 
     async def view_document(self, document_id: str, user_id: str):
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from app.services.embedding_store import normalize_text
+from app.utils import metrics
+
+
+class _LeaderCancelled(Exception):
+    """The coroutine fetching a shared key was cancelled before it finished."""
+
+
+class EmbeddingCache:
+    """
+    In-process LRU cache of embeddings for short, often repeated texts
+    (assessment topics, short answers), keyed by model, task type and
+    normalized text. Entries expire after `ttl_seconds`; at most
+    `max_vectors` are kept, as float32 arrays.
+
+    Concurrent misses for the same key are coalesced: the first coroutine
+    embeds it, the others await its result.
+    """
+
+    def __init__(self, model: str, max_vectors: int, ttl_seconds: float):
+        self.model = model
+        self.max_vectors = max_vectors
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def key(self, task_type: str, text: str) -> str:
+        return f"{self.model}\x1f{task_type}\x1f{normalize_text(text)}"
+
+    async def get_or_embed(
+        self,
+        texts: list[str],
+        task_type: str,
+        embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+    ) -> list[list[float]]:
+        """
+        Returns embeddings for `texts` in order, calling `embed` once for the
+        texts that are neither cached nor already being embedded.
+        """
+        keys = [self.key(task_type, text) for text in texts]
+        text_by_key = dict(zip(keys, texts))
+        found: dict[str, np.ndarray] = {}
+        waiting: dict[str, asyncio.Future] = {}
+        missing: list[str] = []
+
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        for key in text_by_key:
+            vec = self._get(key, now)
+            if vec is not None:
+                found[key] = vec
+            elif key in self._inflight:
+                waiting[key] = self._inflight[key]
+            else:
+                missing.append(key)
+                self._inflight[key] = loop.create_future()
+
+        metrics.increment("embedding_cache.lookups", len(keys))
+        metrics.increment("embedding_cache.hits", sum(1 for k in keys if k in found))
+        metrics.increment("embedding_cache.coalesced", sum(1 for k in keys if k in waiting))
+        metrics.increment("embedding_cache.misses", sum(1 for k in keys if k in missing))
+
+        if missing:
+            found.update(await self._fetch(missing, text_by_key, embed))
+
+        retry = []
+        for key, future in waiting.items():
+            try:
+                # shielded: cancelling this caller must not fail the others
+                found[key] = await asyncio.shield(future)
+            except _LeaderCancelled:
+                retry.append(key)
+        if retry:
+            vectors = await self.get_or_embed([text_by_key[k] for k in retry], task_type, embed)
+            found.update(zip(retry, (np.asarray(v, dtype=np.float32) for v in vectors)))
+
+        return [found[key].tolist() for key in keys]
+
+    async def _fetch(self, keys: list[str], text_by_key: dict[str, str], embed) -> dict[str, np.ndarray]:
+        futures = [self._inflight[key] for key in keys]
+        try:
+            vectors = await embed([text_by_key[key] for key in keys])
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else _LeaderCancelled()
+            for key, future in zip(keys, futures):
+                self._inflight.pop(key, None)
+                future.set_exception(error)
+                future.exception()  # retrieved here; waiters (if any) still get it
+            raise
+
+        expires = time.monotonic() + self.ttl_seconds
+        fetched = {}
+        for key, future, vec in zip(keys, futures, vectors):
+            vec = np.asarray(vec, dtype=np.float32)
+            fetched[key] = vec
+            self._put(key, vec, expires)
+            self._inflight.pop(key, None)
+            future.set_result(vec)
+        return fetched
+
+    def _get(self, key: str, now: float) -> np.ndarray | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, vec = entry
+        if expires <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return vec
+
+    def _put(self, key: str, vec: np.ndarray, expires: float):
+        self._entries[key] = (expires, vec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_vectors:
+            self._entries.popitem(last=False)
+            metrics.increment("embedding_cache.evictions")
+
+    def stats(self) -> dict:
+        return {
+            "vectors": len(self._entries),
+            "max_vectors": self.max_vectors,
+            "ttl_seconds": self.ttl_seconds,
+            "bytes": sum(vec.nbytes for _, vec in self._entries.values()),
+            "inflight": len(self._inflight),
+        }
@@ -1,33 +1,189 @@
 import asyncio
 import logging
 import os
+import time
+from typing import Callable
+
 from langchain_nomic import NomicEmbeddings
 
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_store import EmbeddingStore
+from app.utils import metrics
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION, truncate_embeddings
+from app.utils.rate_governor import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateGovernor
+
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "nomic-embed-text-v1.5"
+
+# Shared limits for all Nomic calls made by this process (see RateGovernor)
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "8"))
+EMBED_INITIAL_CONCURRENCY = int(os.getenv("EMBED_INITIAL_CONCURRENCY", "4"))
+EMBED_TOKENS_PER_SECOND = float(os.getenv("EMBED_TOKENS_PER_SECOND", "50000"))
+EMBED_LATENCY_TARGET_SECONDS = float(os.getenv("EMBED_LATENCY_TARGET_SECONDS", "10"))
+EMBED_THROTTLE_PAUSE_SECONDS = float(os.getenv("EMBED_THROTTLE_PAUSE_SECONDS", "2"))
+
+# In-process cache for query / short-answer embeddings (see EmbeddingCache);
+# 0 vectors disables it. A 768-dim vector takes 3 KB.
+EMBEDDING_CACHE_MAX_VECTORS = int(os.getenv("EMBEDDING_CACHE_MAX_VECTORS", "10000"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    # nomic raises Exception((status_code, body)) once its own retries give up
+    status = error.args[0] if error.args else None
+    return isinstance(status, tuple) and bool(status) and status[0] == 429
+
+
+def _estimate_tokens(texts: list[str]) -> int:
+    return sum(len(text) for text in texts) // 4 + 1
+
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(
+        self,
+        store: EmbeddingStore | None = None,
+        dimension: int = EMBEDDING_DIMENSION,
+    ):
+        # the API returns full-size vectors; they are truncated to `dimension`
+        # here (the store keeps them at full size)
         self.embeddings = NomicEmbeddings(
-            model="nomic-embed-text-v1.5", nomic_api_key=os.getenv("NOMIC_API_KEY")
+            model=EMBEDDING_MODEL, nomic_api_key=os.getenv("NOMIC_API_KEY")
+        )
+        self.store = store
+        self.dimension = dimension
+        self.governor = RateGovernor(
+            max_concurrency=EMBED_MAX_CONCURRENCY,
+            initial_concurrency=EMBED_INITIAL_CONCURRENCY,
+            tokens_per_second=EMBED_TOKENS_PER_SECOND,
+            latency_target=EMBED_LATENCY_TARGET_SECONDS,
+            throttle_pause=EMBED_THROTTLE_PAUSE_SECONDS,
+        )
+        self.cache = (
+            EmbeddingCache(
+                EMBEDDING_MODEL,
+                max_vectors=EMBEDDING_CACHE_MAX_VECTORS,
+                ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+            )
+            if EMBEDDING_CACHE_MAX_VECTORS > 0
+            else None
         )
 
-    async def embed_chunks(self, chunks: list[str]) -> list[list[float]]:
-        """Used for ingestion: handles multiple strings."""
-        return await self._execute_with_retry(self.embeddings.aembed_documents, chunks)
+    async def embed_chunks(
+        self,
+        chunks: list[str],
+        store: bool = False,
+        priority: int = PRIORITY_BULK,
+        cache: bool = False,
+        on_latency: Callable[[float], None] | None = None,
+    ) -> list[list[float]]:
+        """
+        Used for ingestion: handles multiple strings.
+        With `store`, the results are also saved to the embedding store.
+        Pass PRIORITY_INTERACTIVE when a user is waiting on the result, and
+        `cache` for short texts that repeat (e.g. short answers).
+        `on_latency` receives the seconds the successful API request took,
+        without time spent waiting on the rate governor or the store.
+        """
+        if cache and self.cache is not None:
+            return await self.cache.get_or_embed(
+                chunks,
+                "search_document",
+                lambda missing: self._embed_documents(missing, store, priority, on_latency),
+            )
+        return await self._embed_documents(chunks, store, priority, on_latency)
+
+    async def _embed_documents(
+        self,
+        chunks: list[str],
+        store: bool,
+        priority: int,
+        on_latency: Callable[[float], None] | None = None,
+    ) -> list[list[float]]:
+        embeddings = await self._execute_with_retry(
+            self.embeddings.aembed_documents, chunks, priority, on_latency=on_latency
+        )
+        if store and self.store is not None:
+            try:
+                await self.store.put_many(chunks, embeddings)
+            except Exception as e:
+                # the store is only a cache; ingestion goes on without it
+                logger.warning(f"Failed to save embeddings to the store: {e}")
+        return truncate_embeddings(embeddings, self.dimension)
+
+    async def get_stored(self, chunks: list[str]) -> list[list[float] | None]:
+        """
+        Returns previously stored embeddings for `chunks` (None where there
+        is no stored embedding yet, or when no store is configured).
+        """
+        if self.store is None or not chunks:
+            return [None] * len(chunks)
+        try:
+            stored = await self.store.get_many(chunks)
+        except Exception as e:
+            logger.warning(f"Embedding store lookup failed: {e}")
+            return [None] * len(chunks)
+
+        hits = [i for i, vec in enumerate(stored) if vec is not None]
+        truncated = truncate_embeddings([stored[i] for i in hits], self.dimension)
+        for i, vec in zip(hits, truncated):
+            stored[i] = vec
+        return stored
 
     async def embed_query(self, text: str) -> list[float]:
         """Used for search: handles a single string."""
-        return await self._execute_with_retry(self.embeddings.aembed_query, text)
+        return (await self.embed_queries([text]))[0]
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Used for search over several queries: one request for all of them
+        (only for the ones not in the cache).
+        """
+        if not texts:
+            return []
+        if self.cache is not None:
+            return await self.cache.get_or_embed(texts, "search_query", self._embed_queries)
+        return await self._embed_queries(texts)
 
-    async def _execute_with_retry(self, func, data, max_retries=3):
+    async def _embed_queries(self, texts: list[str]) -> list[list[float]]:
+        embeddings = await self._execute_with_retry(
+            self._aembed_queries, texts, PRIORITY_INTERACTIVE
+        )
+        return truncate_embeddings(embeddings, self.dimension)
+
+    async def _aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        # NomicEmbeddings only batches documents; same call with the query task type
+        return await asyncio.to_thread(
+            self.embeddings.embed, texts, task_type="search_query"
+        )
+
+    async def _execute_with_retry(self, func, data, priority, max_retries=3, on_latency=None):
+        tokens = _estimate_tokens([data] if isinstance(data, str) else data)
         for attempt in range(max_retries):
+            # every attempt goes through the governor, so retries after a 429
+            # wait out the shared pause instead of sleeping independently
+            await self.governor.acquire(tokens, priority)
+            started = time.monotonic()
             try:
-                return await func(data)
+                result = await func(data)
             except Exception as e:
-                wait_time = 2**attempt
+                throttled = _is_rate_limited(e)
+                self.governor.release(time.monotonic() - started, throttled=throttled)
+                if throttled:
+                    metrics.increment("embedding.throttled")
                 logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying...")
                 if attempt == max_retries - 1:
                     raise e
-                await asyncio.sleep(wait_time)
+                if not throttled:
+                    await asyncio.sleep(2**attempt)
+                continue
+            except BaseException:
+                self.governor.release(time.monotonic() - started)
+                raise
+
+            latency = time.monotonic() - started
+            self.governor.release(latency)
+            if on_latency is not None:
+                on_latency(latency)
+            return result
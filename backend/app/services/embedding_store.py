@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import vecs
+from sqlalchemy import Float, func, select, text, update
+
+from app.utils import metrics
+from app.utils.embedding_dimension import EMBEDDING_FULL_DIMENSION
+
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+EMBEDDING_STORE_MAX_ROWS = int(os.getenv("EMBEDDING_STORE_MAX_ROWS", "500000"))
+# run the size check after this many new rows have been written
+EMBEDDING_STORE_EVICT_EVERY = int(os.getenv("EMBEDDING_STORE_EVICT_EVERY", "2000"))
+# a hit only rewrites its LRU stamp when the stamp is older than this, so
+# repeated lookups of hot rows stay reads
+EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS = float(
+    os.getenv("EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS", "3600")
+)
+# keys per lookup statement
+EMBEDDING_STORE_LOOKUP_BATCH = 1000
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed store of chunk embeddings shared across
+    documents. Rows live in the `chunk_embeddings` vecs collection, keyed by
+    sha256(model name + normalized chunk text), so a chunk that appears in
+    several uploads (e.g. revisions of a lecture deck) is embedded only once.
+    Size is bounded by evicting the least recently used rows.
+    Vectors are kept at the model's full dimension, so they stay reusable
+    whatever EMBEDDING_DIMENSION the chunk collection uses.
+    """
+
+    def __init__(
+        self,
+        client: vecs.Client,
+        model: str,
+        dimension: int = EMBEDDING_FULL_DIMENSION,
+        max_rows: int = EMBEDDING_STORE_MAX_ROWS,
+    ):
+        self.client = client
+        self.model = model
+        self.max_rows = max_rows
+        self.collection = client.get_or_create_collection(
+            name="chunk_embeddings", dimension=dimension
+        )
+        self.table = self.collection.table
+        self._written_since_evict = 0
+
+        # LRU order for eviction
+        with client.Session() as sess:
+            with sess.begin():
+                sess.execute(
+                    text(
+                        f"""
+                        create index if not exists ix_chunk_embeddings_last_used
+                          on vecs."{self.table.name}"
+                          using btree (((metadata->>'last_used')::float8))
+                        """
+                    )
+                )
+
+    def key(self, chunk_text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model}\x1f{normalize_text(chunk_text)}".encode()
+        ).hexdigest()
+
+    async def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        """
+        Looks up stored embeddings for `texts` in bulk (one statement per
+        EMBEDDING_STORE_LOOKUP_BATCH keys), returning them in order with None
+        for misses. Hits whose LRU stamp is older than
+        EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS have it refreshed.
+        """
+        if not texts:
+            return []
+
+        keys = [self.key(t) for t in texts]
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        for i in range(0, len(unique), EMBEDDING_STORE_LOOKUP_BATCH):
+            found.update(
+                await asyncio.to_thread(
+                    self._fetch, unique[i : i + EMBEDDING_STORE_LOOKUP_BATCH]
+                )
+            )
+        result = [found.get(k) for k in keys]
+
+        hits = sum(1 for vec in result if vec is not None)
+        metrics.increment("embedding_store.lookups", len(result))
+        metrics.increment("embedding_store.hits", hits)
+        metrics.increment("embedding_store.misses", len(result) - hits)
+        return result
+
+    async def put_many(self, texts: list[str], embeddings: list[list[float]]):
+        if not texts:
+            return
+
+        now = time.time()
+        records = {}
+        for chunk_text, vec in zip(texts, embeddings):
+            key = self.key(chunk_text)
+            records[key] = (key, vec, {"model": self.model, "last_used": now})
+        await asyncio.to_thread(self.collection.upsert, records=list(records.values()))
+
+        self._written_since_evict += len(records)
+        if self._written_since_evict >= EMBEDDING_STORE_EVICT_EVERY:
+            self._written_since_evict = 0
+            await asyncio.to_thread(self.evict)
+
+    def _fetch(self, keys: list[str]) -> dict[str, list[float]]:
+        metadata = self.table.c["metadata"]
+        last_used = metadata["last_used"].astext.cast(Float)
+        stale_before = func.extract("epoch", func.now()) - EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS
+        with self.client.Session() as sess:
+            with sess.begin():
+                rows = sess.execute(
+                    select(
+                        self.table.c.id,
+                        self.table.c.vec,
+                        func.coalesce(last_used < stale_before, True),
+                    ).where(self.table.c.id.in_(keys))
+                ).fetchall()
+                stale = [row[0] for row in rows if row[2]]
+                if stale:
+                    # re-checked here: a concurrent lookup may have touched
+                    # the row in the meantime
+                    sess.execute(
+                        update(self.table)
+                        .where(self.table.c.id.in_(stale))
+                        .where(func.coalesce(last_used < stale_before, True))
+                        .values(
+                            {
+                                metadata: metadata.op("||")(
+                                    func.jsonb_build_object(
+                                        "last_used", func.extract("epoch", func.now())
+                                    )
+                                )
+                            }
+                        )
+                    )
+        metrics.increment("embedding_store.touched", len(stale))
+        return {row[0]: [float(x) for x in row[1]] for row in rows}
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used rows once the store grows past
+        max_rows, down to 90% of it. Returns the number of rows removed.
+        """
+        table = f'vecs."{self.table.name}"'
+        with self.client.Session() as sess:
+            with sess.begin():
+                count = sess.execute(text(f"select count(*) from {table}")).scalar()
+                excess = count - int(self.max_rows * 0.9) if count > self.max_rows else 0
+                if excess <= 0:
+                    return 0
+                sess.execute(
+                    text(
+                        f"""
+                        delete from {table}
+                        where id in (
+                          select id from {table}
+                          order by (metadata->>'last_used')::float8
+                          limit :excess
+                        )
+                        """
+                    ).bindparams(excess=excess)
+                )
+
+        metrics.increment("embedding_store.evicted", excess)
+        print(f"Embedding store: evicted {excess} least recently used rows")
+        return excess
@@ -0,0 +1,165 @@
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from supabase import Client
+
+INGESTION_JOB_LEASE_SECONDS = int(os.getenv("INGESTION_JOB_LEASE_SECONDS", "300"))
+INGESTION_JOB_MAX_ATTEMPTS = int(os.getenv("INGESTION_JOB_MAX_ATTEMPTS", "5"))
+INGESTION_RETRY_BASE_SECONDS = float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "30"))
+INGESTION_RETRY_MAX_SECONDS = float(os.getenv("INGESTION_RETRY_MAX_SECONDS", "1800"))
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker has (or had) claimed it."""
+
+
+class JobQueueService:
+    """
+    Durable ingestion job queue backed by the `ingestion_jobs` table
+    (see supabase/ingestion_jobs_migration.sql). Jobs are leased with
+    SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can poll it.
+    """
+
+    def __init__(self, db_client: Client):
+        self.db = db_client
+
+    def enqueue(self, document_id: str) -> dict:
+        """
+        Queues ingestion for a document. If the document already has an
+        active (queued/running) job, that job is returned instead.
+        """
+        active = self.get_active_job(document_id)
+        if active:
+            return active
+
+        try:
+            res = (
+                self.db.table("ingestion_jobs")
+                .insert(
+                    {
+                        "document_id": document_id,
+                        "max_attempts": INGESTION_JOB_MAX_ATTEMPTS,
+                    }
+                )
+                .execute()
+            )
+            return res.data[0]
+        except Exception:
+            # lost the race against a concurrent enqueue (unique active-job index)
+            active = self.get_active_job(document_id)
+            if active:
+                return active
+            raise
+
+    def get_active_job(self, document_id: str) -> dict | None:
+        res = (
+            self.db.table("ingestion_jobs")
+            .select("*")
+            .eq("document_id", document_id)
+            .in_("status", ["queued", "running"])
+            .limit(1)
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    def get_latest_job(self, document_id: str) -> dict | None:
+        res = (
+            self.db.table("ingestion_jobs")
+            .select("*")
+            .eq("document_id", document_id)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    def claim(
+        self, worker_id: str, lease_seconds: int = INGESTION_JOB_LEASE_SECONDS
+    ) -> dict | None:
+        """Leases the next runnable job (including ones whose lease expired)."""
+        res = self.db.rpc(
+            "claim_ingestion_job",
+            {"p_worker_id": worker_id, "p_lease_seconds": lease_seconds},
+        ).execute()
+        return res.data[0] if res.data else None
+
+    def renew_lease(
+        self,
+        job_id: str,
+        worker_id: str,
+        lease_seconds: int = INGESTION_JOB_LEASE_SECONDS,
+    ) -> bool:
+        res = self.db.rpc(
+            "renew_ingestion_job_lease",
+            {
+                "p_job_id": job_id,
+                "p_worker_id": worker_id,
+                "p_lease_seconds": lease_seconds,
+            },
+        ).execute()
+        return bool(res.data)
+
+    def complete(self, job_id: str, worker_id: str):
+        """Marks the job succeeded; raises LeaseLostError if worker_id no longer holds it."""
+        self._update(
+            job_id,
+            worker_id,
+            {"status": "succeeded", "leased_by": None, "lease_expires_at": None},
+        )
+
+    def fail(self, job: dict, error: str, worker_id: str) -> bool:
+        """
+        Records a failed attempt. Re-queues the job with exponential backoff
+        (plus jitter) while attempts remain; returns True if it will be retried.
+        Raises LeaseLostError if worker_id no longer holds the job.
+        """
+        attempts = job.get("attempts") or 1
+        max_attempts = job.get("max_attempts") or INGESTION_JOB_MAX_ATTEMPTS
+
+        if attempts >= max_attempts:
+            self._update(
+                job["id"],
+                worker_id,
+                {
+                    "status": "failed",
+                    "last_error": error,
+                    "leased_by": None,
+                    "lease_expires_at": None,
+                },
+            )
+            return False
+
+        delay = min(
+            INGESTION_RETRY_MAX_SECONDS,
+            INGESTION_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        )
+        delay *= random.uniform(0.8, 1.2)
+        run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+        self._update(
+            job["id"],
+            worker_id,
+            {
+                "status": "queued",
+                "last_error": error,
+                "run_after": run_after.isoformat(),
+                "leased_by": None,
+                "lease_expires_at": None,
+            },
+        )
+        return True
+
+    def _update(self, job_id: str, worker_id: str, data: dict):
+        # fenced by the lease: a worker whose lease was reclaimed must not
+        # overwrite the new owner's job state
+        data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        res = (
+            self.db.table("ingestion_jobs")
+            .update(data)
+            .eq("id", job_id)
+            .eq("leased_by", worker_id)
+            .execute()
+        )
+        if not res.data:
+            raise LeaseLostError(f"Worker {worker_id} no longer holds job {job_id}")
@@ -1,12 +1,25 @@
+import asyncio
 import json
 import os
 from app.schemas.assessment import AssessmentSchema
 import google.generativeai as genai
 from fastapi import HTTPException
 
+# Deadline for one generation; the Gemini request is cancelled when it passes
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, model=None, timeout: float = LLM_TIMEOUT_SECONDS):
+        """
+        model: anything with generate_content_async (the concurrency check
+        script passes a fake); defaults to the configured Gemini model.
+        """
+        self.timeout = timeout
+        if model is not None:
+            self.model = model
+            return
+
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
         self.model = genai.GenerativeModel(
@@ -67,8 +80,14 @@ class LLMService:
                 {schema_json}
                 """
 
-            # call LLM
-            raw_response = self.model.generate_content(prompt)
+            # call LLM without blocking the event loop; on timeout (or when the
+            # caller is cancelled) the in-flight request is cancelled as well
+            raw_response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt, request_options={"timeout": self.timeout}
+                ),
+                timeout=self.timeout,
+            )
 
             # check that response text exists
             if not raw_response.text:
@@ -76,6 +95,9 @@ class LLMService:
 
             return AssessmentSchema.model_validate_json(raw_response.text)
 
+        except asyncio.TimeoutError:  # not the builtin TimeoutError before 3.11
+            print(f"LLM Error: no response within {self.timeout}s")
+            raise HTTPException(status_code=504, detail="Assessment generation timed out")
         except Exception as e:
             # Handle retry logic or fallback if JSON is invalid
             print(f"LLM Error: {e}")
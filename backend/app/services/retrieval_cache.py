@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.embedding_store import normalize_text
+from app.utils import metrics
+
+
+class RetrievalCache:
+    """
+    LRU cache of assessment retrieval results, keyed by topic, the set of
+    documents searched and the chunk count. Entries expire after
+    `ttl_seconds`, at most `max_entries` are kept, and an entry is dropped as
+    soon as chunks of any of its documents change (see
+    VectorDBService.add_change_listener).
+
+    A result computed while an invalidation happened is not stored, since it
+    may predate the change: callers take `generation` before retrieving and
+    pass it to put().
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._by_document: dict[str, set[tuple]] = {}
+        self._generation = 0
+        # invalidations can come from worker threads (index rebuilds)
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def key(self, topic: str, document_ids: list[str], chunks: int) -> tuple:
+        return (normalize_text(topic), tuple(sorted(set(document_ids))), chunks)
+
+    def get(self, key: tuple):
+        metrics.increment("retrieval_cache.lookups")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.increment("retrieval_cache.hits" if entry else "retrieval_cache.misses")
+        return entry[1] if entry else None
+
+    def put(self, key: tuple, value, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            for document_id in key[1]:
+                self._by_document.setdefault(document_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                metrics.increment("retrieval_cache.evictions")
+
+    def invalidate(self, document_ids: list[str] | None):
+        """Drops the entries touching `document_ids` (None: all entries)."""
+        with self._lock:
+            self._generation += 1
+            if document_ids is None:
+                keys = list(self._entries)
+            else:
+                keys = {k for d in document_ids for k in self._by_document.get(d, ())}
+            for key in keys:
+                self._remove(key)
+        if keys:
+            metrics.increment("retrieval_cache.invalidated", len(keys))
+
+    def _remove(self, key: tuple):
+        if self._entries.pop(key, None) is None:
+            return
+        for document_id in key[1]:
+            keys = self._by_document.get(document_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_document[document_id]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "documents": len(self._by_document),
+        }
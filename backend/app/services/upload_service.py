@@ -1,20 +1,34 @@
-import tiktoken
 import os
-import hashlib
-import io
+import asyncio
 from uuid import uuid4
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, UploadFile
-import fitz
-from pptx import Presentation
 from app.services.embedding_service import EmbeddingService
 from app.services.vector_db_service import VectorDBService
+from app.services.job_queue_service import JobQueueService
 from app.tasks import process_document
+from app.utils import metrics
+from app.utils.extraction import extract_pages, pages_to_chunks
+from app.utils.upload_spool import SpooledUpload, UploadTooLarge, spool_upload
 
 from supabase import Client
 
 BUCKET = "pdfs"  # Define the storage bucket name
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB upload limit
+# Request body caps enforced before the multipart body is parsed (see
+# RequestBodyLimitMiddleware): the file(s) plus room for the multipart framing
+MULTIPART_OVERHEAD = 1024 * 1024
+
+# "inline": ingest within the upload request (default, suits request-billed Cloud Run).
+# "queue": enqueue an ingestion job and return; `python -m app.worker` processes it.
+INGESTION_MODE = os.getenv("INGESTION_MODE", "inline")
+
+# Batch uploads: files per request, and files parsed/ingested at the same time
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "30"))
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", "10"))
+MAX_UPLOAD_REQUEST_SIZE = MAX_FILE_SIZE + MULTIPART_OVERHEAD
+MAX_BATCH_REQUEST_SIZE = UPLOAD_BATCH_MAX_FILES * MAX_FILE_SIZE + MULTIPART_OVERHEAD
 
 # Supported formats mapping: MIME type -> extension
 SUPPORTED_FORMATS = {
@@ -29,67 +43,278 @@ class UploadService:
         vector_service: VectorDBService,
         db_client: Client,
         embedding_service: EmbeddingService,
+        job_queue: JobQueueService | None = None,
     ):
         self.vector_service = vector_service
         self.db = db_client
         self.embedding_service = embedding_service
+        self.job_queue = job_queue
+
+    def _upload_to_storage(self, storage_path: str, spool: SpooledUpload, content_type: str):
+        """Idempotent storage upload (x-upsert: true), streamed from the spooled file."""
+        with spool.open() as f:
+            res = self.db.storage.from_(BUCKET).upload(
+                path=storage_path,
+                file=f,
+                file_options={
+                    "content-type": content_type,
+                    "x-upsert": "true",
+                },
+            )
+
+        if hasattr(res, "error") and res.error is not None:
+            raise Exception(f"Supabase Storage Error: {res.error}")
 
     async def execute(
         self,
         file: UploadFile,
         user_id: str,
     ):
-        # 1) Determine file extension from MIME type or filename
-        file_ext = SUPPORTED_FORMATS.get(file.content_type)
-        if not file_ext:
-            # Fallback to filename extension (useful for generic MIME types like octet-stream)
-            name_ext = os.path.splitext(file.filename or "")[1].lower()
-            if name_ext in SUPPORTED_FORMATS.values():
-                file_ext = name_ext
+        file_ext = self._resolve_extension(file)
+
+        # Stream the body to a temp file in fixed-size blocks, hashing as we go,
+        # so memory use per upload doesn't grow with the file size
+        spool = await self._spool(file)
+
+        try:
+            return await self._execute_spooled(file, file_ext, spool, user_id)
+        finally:
+            spool.close()
+
+    async def execute_batch(
+        self,
+        files: list[UploadFile],
+        user_id: str,
+    ) -> dict:
+        """
+        Uploads many files in one request. Hash lookups and user_library links
+        run as bulk queries for the whole batch; parsing, Storage uploads and
+        ingestion run per file with at most UPLOAD_BATCH_CONCURRENCY at once.
+        Returns a per-file result (document + message, or the error) in the
+        order the files were sent.
+        """
+        if not files:
+            raise HTTPException(status_code=400, detail="No files were uploaded.")
+        if len(files) > UPLOAD_BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A batch can hold at most {UPLOAD_BATCH_MAX_FILES} files. It has {len(files)}.",
+            )
+
+        limit = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+        results: list[dict | None] = [None] * len(files)
+
+        def fail(i: int, e: Exception):
+            if isinstance(e, HTTPException):
+                error = {"status_code": e.status_code, "detail": e.detail}
             else:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported file type: {file.content_type}. Please upload PDF or PPTX.",
+                print(f"Batch upload error for {files[i].filename}: {e}")
+                error = {"status_code": 500, "detail": "Internal Server Error during upload."}
+            results[i] = {"file": files[i].filename, "error": error}
+
+        async def spool_one(i: int, file: UploadFile):
+            async with limit:
+                try:
+                    file_ext = self._resolve_extension(file)
+                    spool = await self._spool(file)
+                except Exception as e:
+                    fail(i, e)
+                    return None
+            if not spool.size:
+                spool.close()
+                fail(i, HTTPException(status_code=400, detail="Empty file"))
+                return None
+            return file_ext, spool
+
+        spooled = await asyncio.gather(*(spool_one(i, f) for i, f in enumerate(files)))
+        accepted = {i: item for i, item in enumerate(spooled) if item is not None}
+
+        try:
+            # 1. one lookup for every hash in the batch
+            hashes = list({spool.sha256 for _, spool in accepted.values()})
+            existing_by_hash = {}
+            if hashes:
+                existing_res = (
+                    self.db.table("documents").select("*").in_("file_hash", hashes).execute()
                 )
+                existing_by_hash = {doc["file_hash"]: doc for doc in existing_res.data or []}
 
-        contents = await file.read()
-        if not contents:
-            raise HTTPException(status_code=400, detail="Empty file")
+            # 2. split into the dedup fast path and files that need ingestion;
+            # the same file sent twice in one batch is only ingested once
+            fast_path: dict[int, dict] = {}
+            to_ingest: dict[str, list[int]] = {}
+            for i, (_, spool) in accepted.items():
+                metrics.increment("uploads.total")
+                existing = existing_by_hash.get(spool.sha256)
+                if existing and existing.get("status") != "failed":
+                    metrics.increment("uploads.dedup_fast_path")
+                    fast_path[i] = existing
+                else:
+                    to_ingest.setdefault(spool.sha256, []).append(i)
+
+            # 3. parse, validate and upsert the document rows of new files
+            async def prepare_one(indexes: list[int]):
+                i = indexes[0]
+                file_ext, spool = accepted[i]
+                async with limit:
+                    return await self._prepare_document(
+                        files[i], file_ext, spool, existing_by_hash.get(spool.sha256)
+                    )
 
-        # Check file size limit (50MB)
-        MAX_FILE_SIZE = 50 * 1024 * 1024
-        file_size = len(contents)
-        if file_size > MAX_FILE_SIZE:
+            prepared_list = await asyncio.gather(
+                *(prepare_one(indexes) for indexes in to_ingest.values()),
+                return_exceptions=True,
+            )
+            prepared = {}
+            for indexes, outcome in zip(to_ingest.values(), prepared_list):
+                if isinstance(outcome, Exception):
+                    for i in indexes:
+                        fail(i, outcome)
+                else:
+                    prepared[indexes[0]] = (indexes, outcome)
+
+            # 4. one round of user_library queries for every document in the batch
+            linked_ids = [doc["id"] for doc in fast_path.values()] + [
+                outcome[0]["id"] for _, outcome in prepared.values()
+            ]
+            restored = self._link_users(user_id, list(dict.fromkeys(linked_ids)))
+
+            for i, document in fast_path.items():
+                message = (
+                    "Document restored from trash."
+                    if document["id"] in restored
+                    else "Document already exists."
+                )
+                results[i] = {"file": files[i].filename, **self._upload_response(document, message)}
+
+            # 5. Storage upload + ingestion (or enqueueing) with bounded parallelism
+            async def ingest_one(indexes: list[int], outcome):
+                document, chunks, content_type, message = outcome
+                _, spool = accepted[indexes[0]]
+                async with limit:
+                    return await self._start_ingestion(
+                        document, spool, content_type, chunks, message
+                    )
+
+            ingested = await asyncio.gather(
+                *(ingest_one(indexes, outcome) for indexes, outcome in prepared.values()),
+                return_exceptions=True,
+            )
+            for (indexes, _), outcome in zip(prepared.values(), ingested):
+                for i in indexes:
+                    if isinstance(outcome, Exception):
+                        fail(i, outcome)
+                    else:
+                        results[i] = {"file": files[i].filename, **outcome}
+        finally:
+            for _, spool in accepted.values():
+                spool.close()
+
+        return {
+            "results": results,
+            "uploaded": sum(1 for r in results if "error" not in r),
+            "failed": sum(1 for r in results if "error" in r),
+        }
+
+    @staticmethod
+    def _resolve_extension(file: UploadFile) -> str:
+        """Determine file extension from MIME type or filename."""
+        file_ext = SUPPORTED_FORMATS.get(file.content_type)
+        if file_ext:
+            return file_ext
+
+        # Fallback to filename extension (useful for generic MIME types like octet-stream)
+        name_ext = os.path.splitext(file.filename or "")[1].lower()
+        if name_ext in SUPPORTED_FORMATS.values():
+            return name_ext
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file.content_type}. Please upload PDF or PPTX.",
+        )
+
+    @staticmethod
+    async def _spool(file: UploadFile) -> SpooledUpload:
+        # the parser has counted the bytes already (the request as a whole
+        # was capped by RequestBodyLimitMiddleware before parsing)
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=413,
-                detail=f"File size exceeds 50MB limit. File size: {len(contents) / (1024 * 1024):.2f}MB",
+                detail=f"File size exceeds 50MB limit. File size: {file.size / (1024 * 1024):.2f}MB",
+            )
+        try:
+            return await spool_upload(file, MAX_FILE_SIZE)
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=413, detail="File size exceeds 50MB limit."
             )
 
-        page_count = 0
-        full_text = ""
+    async def _execute_spooled(
+        self,
+        file: UploadFile,
+        file_ext: str,
+        spool: SpooledUpload,
+        user_id: str,
+    ):
+        if not spool.size:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        metrics.increment("uploads.total")
 
+        # 1. Lookup: Check for an existing document by 'file_hash' before any
+        # parsing, since the hash is already known from spooling
+        existing = (
+            self.db.table("documents")
+            .select("*")
+            .eq("file_hash", spool.sha256)
+            .maybe_single()
+            .execute()
+        )
+        existing_doc = existing.data if existing else None
+
+        # Case 1: Document exists and is NOT failed (ready, processing, indexing).
+        # Fast path: just link it to the user, no parsing or token counting.
+        if existing_doc and existing_doc.get("status") != "failed":
+            metrics.increment("uploads.dedup_fast_path")
+            restored_from_trash = self._link_user(user_id, existing_doc["id"])
+            message = (
+                "Document restored from trash."
+                if restored_from_trash
+                else "Document already exists."
+            )
+            return self._upload_response(existing_doc, message)
+
+        # Case 2: Document is new OR previously failed
+        document, chunks, content_type, message = await self._prepare_document(
+            file, file_ext, spool, existing_doc
+        )
+        self._link_user(user_id, document["id"])
+        return await self._start_ingestion(document, spool, content_type, chunks, message)
+
+    async def _prepare_document(
+        self,
+        file: UploadFile,
+        file_ext: str,
+        spool: SpooledUpload,
+        existing_doc: dict | None,
+    ) -> tuple[dict, list[dict], str, str]:
+        """
+        Parses and validates a new (or previously failed) upload and upserts
+        its document row. Returns the row, its chunks, the content type for
+        Storage and the response message.
+        """
+        # Single extraction pass: the per-page text is chunked right away, and
+        # the chunker's token total drives the limit checks below. The chunks
+        # are handed straight to process_document.
         try:
-            if file_ext == ".pdf":
-                with fitz.open(stream=contents, filetype="pdf") as doc:
-                    page_count = len(doc)
-                    for page_num in range(page_count):
-                        page = doc.load_page(page_num)
-                        full_text += page.get_text("text") + "\n"
-            elif file_ext == ".pptx":
-                prs = Presentation(io.BytesIO(contents))
-                page_count = len(prs.slides)
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"):
-                            full_text += shape.text + " "
-                    full_text += "\n"
+            pages, chunks, token_count = await asyncio.to_thread(
+                self._extract_spooled, spool, file_ext
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=400, detail=f"Failed to parse {file_ext} content: {str(e)}"
             )
 
-        encoding = tiktoken.get_encoding("cl100k_base")
-        token_count = len(encoding.encode(full_text))
+        page_count = len(pages)
 
         # Check limits
         MAX_PAGES = int(os.getenv("MAX_PDF_PAGES", "2000"))
@@ -106,121 +331,163 @@ class UploadService:
                 detail=f"File exceeds the {MAX_DOCUMENT_TOKENS}-token limit. It contains {token_count} tokens.",
             )
 
-        sha256 = hashlib.sha256(contents).hexdigest()
-        file_name = file.filename or f"upload{file_ext}"
+        document_id = existing_doc["id"] if existing_doc else str(uuid4())
+        storage_path = f"{document_id}{file_ext}"
 
-        # 1. Lookup: Check for an existing document by 'file_hash'
-        existing = (
-            self.db.table("documents")
-            .select("*")
-            .eq("file_hash", sha256)
-            .maybe_single()
-            .execute()
+        doc_data = {
+            "id": document_id,
+            "file_hash": spool.sha256,
+            "file_name": file.filename or f"upload{file_ext}",
+            "file_path": storage_path,
+            "file_size": spool.size,
+            "page_count": page_count,
+            "token_count": token_count,
+            "status": "pending",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        # Idempotent upsert on the document record
+        upsert_res = self.db.table("documents").upsert(doc_data, on_conflict="file_hash").execute()
+        if not upsert_res.data:
+            raise HTTPException(status_code=500, detail="Failed to upsert document row")
+
+        # Get correct MIME type for storage upload
+        content_type = file.content_type
+        if content_type not in SUPPORTED_FORMATS:
+            content_type = next(k for k, v in SUPPORTED_FORMATS.items() if v == file_ext)
+
+        message = "Upload successful." if not existing_doc else "Recovered failed document and re-started processing."
+
+        return upsert_res.data[0], chunks, content_type, message
+
+    async def _start_ingestion(
+        self,
+        document: dict,
+        spool: SpooledUpload,
+        content_type: str,
+        chunks: list[dict],
+        message: str,
+    ) -> dict:
+        document_id = document["id"]
+        storage_path = document["file_path"]
+
+        if INGESTION_MODE == "queue" and self.job_queue is not None:
+            return await self._enqueue_ingestion(
+                document, storage_path, spool, content_type, message
+            )
+
+        # Trigger ingestion exactly once. The Storage upload runs alongside
+        # ingestion instead of in front of it, since process_document works
+        # from the chunks produced above.
+        storage_upload = asyncio.to_thread(
+            self._upload_to_storage, storage_path, spool, content_type
+        )
+        ingestion = process_document(
+            document_id=document_id,
+            file_hash=document["file_hash"],
+            file_path=storage_path,
+            db_client=self.db,
+            vector_service=self.vector_service,
+            embedding_service=self.embedding_service,
+            chunks=chunks,
+        )
+        upload_result, _ = await asyncio.gather(
+            storage_upload, ingestion, return_exceptions=True
         )
 
-        document = None
-        should_trigger_task = False
-        message = ""
-        restored_from_trash = False
-
-        # Case 1: Document exists and is NOT failed (ready, processing, indexing)
-        if existing and existing.data and existing.data.get("status") != "failed":
-            document = existing.data
-            document_id = document["id"]
-            message = "Document already exists."
-        else:
-            # Case 2: Document is new OR previously failed
-            document_id = existing.data["id"] if (existing and existing.data) else str(uuid4())
-            storage_path = f"{document_id}{file_ext}"
-
-            doc_data = {
-                "id": document_id,
-                "file_hash": sha256,
-                "file_name": file_name,
-                "file_path": storage_path,
-                "file_size": file_size,
-                "page_count": page_count,
-                "token_count": token_count,
-                "status": "pending",
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
-
-            # Idempotent upsert on the document record
-            upsert_res = self.db.table("documents").upsert(doc_data, on_conflict="file_hash").execute()
-            if not upsert_res.data:
-                raise HTTPException(status_code=500, detail="Failed to upsert document row")
-            
-            document = upsert_res.data[0]
-
-            try:
-                # Get correct MIME type for storage upload
-                content_type = file.content_type
-                if content_type not in SUPPORTED_FORMATS:
-                    content_type = next(k for k, v in SUPPORTED_FORMATS.items() if v == file_ext)
-
-                # Idempotent storage upload (x-upsert: true)
-                res = self.db.storage.from_(BUCKET).upload(
-                    path=storage_path,
-                    file=contents,
-                    file_options={
-                        "content-type": content_type,
-                        "x-upsert": "true",
-                    },
-                )
+        if isinstance(upload_result, Exception):
+            # If storage fails, mark it as failed so it can be recovered later
+            self.db.table("documents").update({"status": "failed"}).eq("id", document_id).execute()
+            raise HTTPException(status_code=500, detail=f"Storage upload failed: {upload_result}")
 
-                if hasattr(res, "error") and res.error is not None:
-                    raise Exception(f"Supabase Storage Error: {res.error}")
+        # Re-fetch document to get the latest status (likely 'ready' or 'failed')
+        final_doc_res = self.db.table("documents").select("*").eq("id", document_id).maybe_single().execute()
+        if final_doc_res.data:
+            document = final_doc_res.data
 
-                should_trigger_task = True
-                message = "Upload successful." if not existing else "Recovered failed document and re-started processing."
+        return self._upload_response(document, message)
 
-            except Exception as e:
-                # If storage fails, mark it as failed so it can be recovered later
-                self.db.table("documents").update({"status": "failed"}).eq("id", document_id).execute()
-                raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+    async def _enqueue_ingestion(
+        self,
+        document: dict,
+        storage_path: str,
+        spool: SpooledUpload,
+        content_type: str,
+        message: str,
+    ) -> dict:
+        """
+        Queue mode: the worker reads the file from Storage, so the upload has to
+        finish first; the request then returns as soon as the job is enqueued.
+        """
+        document_id = document["id"]
+        try:
+            await asyncio.to_thread(
+                self._upload_to_storage, storage_path, spool, content_type
+            )
+        except Exception as e:
+            # If storage fails, mark it as failed so it can be recovered later
+            self.db.table("documents").update({"status": "failed"}).eq("id", document_id).execute()
+            raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+
+        job = self.job_queue.enqueue(document_id)
+
+        result = self._upload_response(document, message)
+        result["job"] = {"id": job["id"], "status": job["status"]}
+        return result
+
+    @staticmethod
+    def _extract_spooled(
+        spool: SpooledUpload, file_ext: str
+    ) -> tuple[list[str], list[dict], int]:
+        # runs in a worker thread: extraction of large files takes seconds
+        with spool.mapped() as data:
+            pages = extract_pages(data, file_ext, file_path=spool.path)
+        chunks, token_count = pages_to_chunks(pages, file_ext, spool.sha256)
+        return pages, chunks, token_count
+
+    def _link_user(self, user_id: str, document_id: str) -> bool:
+        """
+        User Linking:
+        - If an existing link is trashed, restore it (deleted_at -> null)
+        - If no link exists, insert a fresh link
+        Returns True when the link was restored from the trash.
+        """
+        return document_id in self._link_users(user_id, [document_id])
+
+    def _link_users(self, user_id: str, document_ids: list[str]) -> set[str]:
+        """
+        Links several documents to a user with one query per step (lookup,
+        restore from trash, insert). Returns the ids restored from the trash.
+        """
+        if not document_ids:
+            return set()
 
-        # 4. User Linking:
-        # - If an existing link is trashed, restore it (deleted_at -> null)
-        # - If no link exists, insert a fresh link
         link_res = (
             self.db.table("user_library")
-            .select("deleted_at")
+            .select("document_id, deleted_at")
             .eq("user_id", user_id)
-            .eq("document_id", document_id)
-            .maybe_single()
+            .in_("document_id", document_ids)
             .execute()
         )
+        links = {row["document_id"]: row for row in link_res.data or []}
+
+        trashed = [
+            doc_id for doc_id, row in links.items() if row.get("deleted_at") is not None
+        ]
+        if trashed:
+            self.db.table("user_library").update({"deleted_at": None}).eq(
+                "user_id", user_id
+            ).in_("document_id", trashed).execute()
 
-        if link_res and link_res.data:
-            if link_res.data.get("deleted_at") is not None:
-                self.db.table("user_library").update({"deleted_at": None}).eq(
-                    "user_id", user_id
-                ).eq("document_id", document_id).execute()
-                restored_from_trash = True
-        else:
+        missing = [doc_id for doc_id in document_ids if doc_id not in links]
+        if missing:
             self.db.table("user_library").insert(
-                {"user_id": user_id, "document_id": document_id}
+                [{"user_id": user_id, "document_id": doc_id} for doc_id in missing]
             ).execute()
 
-        # 5. Single Trigger: if 'should_trigger_task' is True, await the task exactly once
-        if should_trigger_task:
-            await process_document(
-                document_id=document_id,
-                file_hash=sha256,
-                file_path=document["file_path"],
-                db_client=self.db,
-                vector_service=self.vector_service,
-                embedding_service=self.embedding_service,
-            )
-
-            # Re-fetch document to get the latest status (likely 'ready' or 'failed')
-            final_doc_res = self.db.table("documents").select("*").eq("id", document_id).maybe_single().execute()
-            if final_doc_res.data:
-                document = final_doc_res.data
-
-        if restored_from_trash and not should_trigger_task:
-            message = "Document restored from trash."
+        return set(trashed)
 
+    def _upload_response(self, document: dict, message: str) -> dict:
         return {
             "document": {
                 "id": document["id"],
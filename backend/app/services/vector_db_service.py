@@ -1,18 +1,381 @@
+import asyncio
+import os
+import re
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Callable
+from uuid import uuid4
+
 import vecs
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    and_,
+    cast,
+    delete,
+    event,
+    exc,
+    func,
+    literal,
+    make_url,
+    or_,
+    select,
+    text,
+    true,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from vecs.collection import build_filters
+
+from app.utils import metrics
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION, chunk_collection_name
+
+# How chunk vectors are searched:
+# - "float32": the stored vectors directly (original layout)
+# - "halfvec": a half-precision HNSW expression index finds candidates
+# - "binary": a binary-quantized (1 bit/dim) HNSW expression index finds candidates
+# In the quantized modes the top limit x VECTOR_RERANK_FACTOR candidates are
+# reranked by exact cosine distance against the full-precision `vec` column.
+VECTOR_STORAGE_FORMAT = os.getenv("VECTOR_STORAGE_FORMAT", "float32")
+_DEFAULT_RERANK_FACTOR = {"float32": 1, "halfvec": 2, "binary": 8}
+# empty/unset -> a default that suits the format
+VECTOR_RERANK_FACTOR = int(
+    os.getenv("VECTOR_RERANK_FACTOR") or _DEFAULT_RERANK_FACTOR.get(VECTOR_STORAGE_FORMAT, 1)
+)
+
+# HNSW build parameters (pgvector defaults) and the default query-time ef_search
+VECTOR_INDEX_M = int(os.getenv("VECTOR_INDEX_M", "16"))
+VECTOR_INDEX_EF_CONSTRUCTION = int(os.getenv("VECTOR_INDEX_EF_CONSTRUCTION", "64"))
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "40"))
+# A filter (e.g. one user's documents) matching at most this many chunks is
+# searched exactly through the document_id index: an HNSW scan applies the
+# filter after collecting ef_search candidates, so when the matching chunks
+# are a small part of the table it can come back with fewer than k results.
+# Wider filters use the HNSW index with pgvector's iterative scan (0.8+), or
+# on older versions an ef_search raised in proportion to the filter.
+VECTOR_EXACT_SCAN_MAX_ROWS = int(os.getenv("VECTOR_EXACT_SCAN_MAX_ROWS", "20000"))
+# hnsw.ef_search only goes up to 1000
+_MAX_EF_SEARCH = 1000
+# create missing indexes at startup (otherwise they are only reported)
+VECTOR_INDEX_AUTOCREATE = os.getenv("VECTOR_INDEX_AUTOCREATE", "true").lower() == "true"
+
+# Queries, upserts and deletes use an asyncpg pool, so they never block the
+# event loop. The pool keeps VECTOR_POOL_MIN_SIZE connections open and grows
+# to VECTOR_POOL_MAX_SIZE; a request waits at most VECTOR_POOL_TIMEOUT_SECONDS
+# for a free connection. Connections are pinged on checkout and recycled.
+VECTOR_POOL_MIN_SIZE = int(os.getenv("VECTOR_POOL_MIN_SIZE", "2"))
+VECTOR_POOL_MAX_SIZE = int(os.getenv("VECTOR_POOL_MAX_SIZE", "10"))
+VECTOR_POOL_TIMEOUT_SECONDS = float(os.getenv("VECTOR_POOL_TIMEOUT_SECONDS", "10"))
+VECTOR_POOL_RECYCLE_SECONDS = int(os.getenv("VECTOR_POOL_RECYCLE_SECONDS", "1800"))
+VECTOR_STATEMENT_TIMEOUT_MS = int(os.getenv("VECTOR_STATEMENT_TIMEOUT_MS", "15000"))
+# DATABASE_URL points at pgbouncer in transaction mode (e.g. the Supabase
+# pooler on port 6543): prepared statements cannot be cached there
+VECTOR_DB_PGBOUNCER = os.getenv("VECTOR_DB_PGBOUNCER", "false").lower() == "true"
+
+# Writes and deletes NOTIFY this channel with the affected document ids
+# ("*" = any document), so other processes can drop cached retrievals.
+VECTOR_CHANGES_CHANNEL = "vector_chunks_changed"
+# NOTIFY payloads must stay under 8000 bytes
+_MAX_NOTIFY_PAYLOAD = 7900
+_RELISTEN_DELAY_SECONDS = 5
+
+_INDEX_PARAM = re.compile(r"\b(m|ef_construction)\s*=\s*'?(\d+)")
+# how each format's HNSW index shows up in pg_indexes.indexdef
+_ANN_INDEX_SIGNATURE = {
+    "float32": "(vec vector_cosine_ops)",
+    "halfvec": "halfvec_cosine_ops",
+    "binary": "bit_hamming_ops",
+}
+
+# Chunk metadata that is also stored as typed columns once
+# scripts/migrate_chunk_columns.py has run. Filters on these keys use the
+# columns, so the planner can use their indexes and prune partitions.
+TYPED_COLUMNS = {
+    "document_id": postgresql.UUID(as_uuid=False),
+    "file_hash": String,
+    "page_number": Integer,
+    "chunk_index": Integer,
+}
+
+
+class AsyncpgVector(VECTOR):
+    """
+    pgvector's VECTOR type. Under asyncpg, values go as-is to the binary
+    codec installed by pgvector.asyncpg.register_vector.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        if dialect.driver == "asyncpg":
+            return None
+        return super().bind_processor(dialect)
+
+
+def build_chunk_table(name: str, dimension: int, typed_columns: bool) -> Table:
+    """The vecs table (id, vec, metadata), plus the typed columns if migrated."""
+    table = Table(
+        name,
+        MetaData(schema="vecs"),
+        Column("id", String, primary_key=True),
+        Column("vec", AsyncpgVector(dimension), nullable=False),
+        Column(
+            "metadata",
+            postgresql.JSONB,
+            server_default=text("'{}'::jsonb"),
+            nullable=False,
+        ),
+    )
+    if typed_columns:
+        for column, column_type in TYPED_COLUMNS.items():
+            table.append_column(Column(column, column_type))
+    return table
+
+
+def create_vector_engine(db_url: str, vector_schema: str) -> AsyncEngine:
+    """asyncpg engine for DATABASE_URL with the pool settings above."""
+    url = make_url(db_url).set(drivername="postgresql+asyncpg")
+    connect_args = {}
+    # asyncpg takes `ssl` instead of libpq's sslmode
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        url = url.difference_update_query(["sslmode"])
+        if sslmode != "disable":
+            connect_args["ssl"] = sslmode
+    if VECTOR_DB_PGBOUNCER:
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+
+    engine = create_async_engine(
+        url,
+        pool_size=VECTOR_POOL_MIN_SIZE,
+        max_overflow=max(0, VECTOR_POOL_MAX_SIZE - VECTOR_POOL_MIN_SIZE),
+        pool_timeout=VECTOR_POOL_TIMEOUT_SECONDS,
+        pool_recycle=VECTOR_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_vector(dbapi_connection, connection_record):
+        dbapi_connection.run_async(lambda conn: register_vector(conn, schema=vector_schema))
+
+    return engine
 
 
 class VectorDBService:
-    def __init__(self, db_url: str):
+    def __init__(
+        self,
+        db_url: str,
+        dimension: int = EMBEDDING_DIMENSION,
+        storage_format: str = VECTOR_STORAGE_FORMAT,
+        rerank_factor: int = VECTOR_RERANK_FACTOR,
+        collection_name: str | None = None,
+        index_m: int = VECTOR_INDEX_M,
+        index_ef_construction: int = VECTOR_INDEX_EF_CONSTRUCTION,
+        ef_search: int = VECTOR_EF_SEARCH,
+    ):
         """
         Initializes the Vector Database client.
 
         Args:
             db_url: The connection string for the PostgreSQL database with pgvector.
+            dimension: Size of the stored embeddings (EMBEDDING_DIMENSION);
+                each dimension has its own collection.
+            storage_format: "float32", "halfvec" or "binary" (VECTOR_STORAGE_FORMAT).
+            rerank_factor: Candidates fetched per requested result in the
+                quantized formats.
+            collection_name: Overrides the collection (benchmarks use a scratch one).
+            index_m, index_ef_construction: HNSW build parameters.
+            ef_search: Default HNSW candidate list size at query time.
         """
+        if storage_format not in _DEFAULT_RERANK_FACTOR:
+            raise ValueError(f"Unknown VECTOR_STORAGE_FORMAT: {storage_format}")
+
         self.client = vecs.create_client(db_url)
-        self.collection = self.client.get_or_create_collection(
-            name="document_chunks", dimension=768
-        )
+        self.dimension = dimension
+        self.storage_format = storage_format
+        self.rerank_factor = max(1, rerank_factor)
+        self.index_m = index_m
+        self.index_ef_construction = index_ef_construction
+        self.ef_search = ef_search
+        # hnsw.iterative_scan keeps scanning until enough rows pass the filter
+        self.iterative_scan = self._pgvector_version() >= (0, 8)
+
+        name = collection_name or chunk_collection_name(dimension)
+        relkind, columns = self._inspect_table(name)
+        # a hash-partitioned chunk table (see scripts/migrate_chunk_columns.py)
+        # is not a vecs collection; a plain one is created by vecs on first use
+        self.partitioned = relkind == "p"
+        if not self.partitioned:
+            self.client.get_or_create_collection(name=name, dimension=dimension)
+        self.typed_columns = set(TYPED_COLUMNS) <= columns
+        self.table = build_chunk_table(name, dimension, self.typed_columns)
+
+        # the sync vecs client above is kept for DDL (indexes, migrations) and
+        # the embedding store; request-path statements go through this pool
+        self.engine = create_vector_engine(db_url, self._vector_schema())
+        self._waiting = 0
+        self._change_listeners: list[Callable[[list[str] | None], None]] = []
+        self._listen_conn = None
+        self._relisten_task = None
+
+    def _vector_schema(self) -> str:
+        """Schema of the pgvector extension (public, or extensions on Supabase)."""
+        with self.client.Session() as sess:
+            return sess.execute(
+                text(
+                    "select n.nspname from pg_extension e "
+                    "join pg_namespace n on n.oid = e.extnamespace "
+                    "where e.extname = 'vector'"
+                )
+            ).scalar() or "public"
+
+    def _pgvector_version(self) -> tuple[int, ...]:
+        with self.client.Session() as sess:
+            version = sess.execute(
+                text("select extversion from pg_extension where extname = 'vector'")
+            ).scalar()
+        return tuple(int(part) for part in re.findall(r"\d+", version or "0"))
+
+    async def open(self):
+        """Opens the pool's minimum number of connections up front."""
+        async with AsyncExitStack() as stack:
+            for _ in range(VECTOR_POOL_MIN_SIZE):
+                await stack.enter_async_context(self.engine.connect())
+
+    async def close(self):
+        if self._relisten_task:
+            self._relisten_task.cancel()
+        listen_conn, self._listen_conn = self._listen_conn, None
+        if listen_conn is not None:
+            # not returned to the pool: it is still LISTENing
+            await listen_conn.invalidate()
+        await self.engine.dispose()
+
+    def add_change_listener(self, callback: Callable[[list[str] | None], None]):
+        """
+        Calls `callback(document_ids)` after chunks of those documents are
+        written or deleted (None: any document, e.g. after an index rebuild).
+        Changes made by this process are reported directly; changes made by
+        other processes (the ingestion worker, scripts) once
+        listen_for_changes() is running.
+        """
+        self._change_listeners.append(callback)
+
+    def _changed(self, document_ids: list[str] | None):
+        for callback in self._change_listeners:
+            try:
+                callback(document_ids)
+            except Exception as e:
+                print(f"Vector change listener error: {e}")
+
+    def _notify(self, document_ids: list[str] | None):
+        payload = "*" if document_ids is None else ",".join(document_ids)
+        if len(payload) > _MAX_NOTIFY_PAYLOAD:
+            payload = "*"
+        return select(func.pg_notify(VECTOR_CHANGES_CHANNEL, payload))
+
+    async def listen_for_changes(self):
+        """
+        LISTENs for change notifications from other processes on a dedicated
+        connection (one of the pool's). Not possible through pgbouncer in
+        transaction mode; listeners then only see this process's changes.
+        """
+        if VECTOR_DB_PGBOUNCER:
+            print("VECTOR_DB_PGBOUNCER is set: not listening for vector changes")
+            return
+        self._listen_conn = await self.engine.connect()
+        raw = await self._listen_conn.get_raw_connection()
+        driver = raw.driver_connection
+        await driver.add_listener(VECTOR_CHANGES_CHANNEL, self._on_notification)
+        driver.add_termination_listener(self._on_listen_terminated)
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        self._changed(None if payload == "*" else payload.split(","))
+
+    def _on_listen_terminated(self, connection):
+        if self._listen_conn is None:  # closed by close()
+            return
+        # notifications may have been missed meanwhile
+        print("Vector change listener connection lost; reconnecting")
+        self._changed(None)
+        self._listen_conn = None
+        self._relisten_task = asyncio.get_running_loop().create_task(self._relisten())
+
+    async def _relisten(self):
+        while True:
+            await asyncio.sleep(_RELISTEN_DELAY_SECONDS)
+            try:
+                await self.listen_for_changes()
+                self._changed(None)
+                return
+            except Exception as e:
+                print(f"Vector change listener reconnect failed: {e}")
+
+    def pool_stats(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "min_size": VECTOR_POOL_MIN_SIZE,
+            "max_size": VECTOR_POOL_MAX_SIZE,
+            "open": pool.checkedin() + pool.checkedout(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "waiting": self._waiting,
+        }
+
+    @asynccontextmanager
+    async def _connection(self, statement_timeout_ms: int = VECTOR_STATEMENT_TIMEOUT_MS):
+        """
+        A pooled connection inside a transaction. statement_timeout (and the
+        hnsw settings, see _prepare_search) are set per transaction with
+        set_config(..., true), which also works through pgbouncer.
+        """
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            conn = await self.engine.connect()
+        except exc.TimeoutError:
+            metrics.increment("vector_pool.timeouts")
+            raise
+        finally:
+            self._waiting -= 1
+        metrics.increment("vector_pool.acquires")
+        metrics.increment("vector_pool.wait_ms", (time.perf_counter() - started) * 1000)
+
+        try:
+            async with conn.begin():
+                await conn.execute(
+                    select(func.set_config("statement_timeout", str(statement_timeout_ms), True))
+                )
+                yield conn
+        finally:
+            await conn.close()
+
+    def _inspect_table(self, name: str) -> tuple[str | None, set[str]]:
+        """The table's relkind ("r", "p" or None if missing) and column names."""
+        with self.client.Session() as sess:
+            relkind = sess.execute(
+                text(
+                    "select relkind from pg_class "
+                    "where relnamespace = 'vecs'::regnamespace and relname = :name"
+                ),
+                {"name": name},
+            ).scalar()
+            columns = sess.execute(
+                text(
+                    "select column_name from information_schema.columns "
+                    "where table_schema = 'vecs' and table_name = :name"
+                ),
+                {"name": name},
+            ).scalars().all()
+        return relkind, set(columns)
 
     async def upsert_chunks(
         self,
@@ -24,7 +387,8 @@ class VectorDBService:
     ):
         """
         Formats and uploads chunks and their embeddings to Supabase pgvector.
-        Every chunk gets the file_hash and document_id in its metadata for filtering.
+        Every chunk gets the file_hash and document_id in its metadata for filtering
+        (and in the typed columns, once the table has them).
         """
         records = []
         for i, chunk in enumerate(chunks):
@@ -32,21 +396,62 @@ class VectorDBService:
             text = chunk.get("text", "")
             page_num = chunk.get("page_number", -1)
 
-            records.append(
-                (
-                    f"{file_hash}_{global_index}",  # unique id for the chunk
-                    embeddings[i],
-                    {
-                        "document_id": document_id,
-                        "file_hash": file_hash,
-                        "text": text,
-                        "page_number": page_num,
-                        "chunk_index": global_index,
-                    },
-                )
-            )
-        # batch upload
-        self.collection.upsert(records=records)
+            metadata = {
+                "document_id": document_id,
+                "file_hash": file_hash,
+                "text": text,
+                "page_number": page_num,
+                "chunk_index": global_index,
+            }
+            record = {
+                "id": f"{file_hash}_{global_index}",  # unique id for the chunk
+                "vec": embeddings[i],
+                "metadata": metadata,
+            }
+            if self.typed_columns:
+                record.update({column: metadata[column] for column in TYPED_COLUMNS})
+            records.append(record)
+
+        stmt = postgresql.insert(self.table)
+        # a partitioned table's primary key also includes the partition key
+        conflict = ["id", "document_id"] if self.partitioned else ["id"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict,
+            set_={
+                column.name: stmt.excluded[column.name]
+                for column in self.table.columns
+                if column.name not in conflict
+            },
+        )
+        # batch upload (awaited on the pool, so embedding of the next batch
+        # keeps running while this one is written)
+        async with self._connection() as conn:
+            await conn.execute(stmt, records)
+            await conn.execute(self._notify([document_id]))
+        self._changed([document_id])
+
+    def _build_filters(self, filters: dict):
+        """
+        vecs-style metadata filters ({"field": {"$op": value}}, "$and", "$or")
+        as SQL. Typed columns are used for document_id, file_hash, page_number
+        and chunk_index ($eq / $ne / $in); everything else filters the metadata.
+        """
+        (key, value), = filters.items()
+        if key in ("$and", "$or"):
+            clauses = [self._build_filters(condition) for condition in value]
+            return and_(*clauses) if key == "$and" else or_(*clauses)
+
+        if self.typed_columns and key in TYPED_COLUMNS and len(value) == 1:
+            (op, operand), = value.items()
+            column = self.table.c[key]
+            if op == "$eq":
+                return column == operand
+            if op == "$ne":
+                return column != operand
+            if op == "$in":
+                return column.in_(operand)
+
+        return build_filters(self.table.c["metadata"], filters)
 
     async def query(
         self,
@@ -55,65 +460,436 @@ class VectorDBService:
         filters: dict[str, any],
         include_value: bool = False,
         include_metadata: bool = True,
+        ef_search: int | None = None,
     ) -> list[tuple[str, float, dict[str, any]]]:
         """
-        Queries the 'vecs' collection using pgvector.
+        Queries the chunk table using pgvector.
+        ef_search overrides the HNSW candidate list size for this call
+        (higher = better recall, slower).
+        Returns ids when neither value nor metadata is requested, otherwise
+        rows of (id, [cosine distance], [metadata]), like vecs.
         """
+        ef_search = ef_search or self.ef_search
         try:
-            results = self.collection.query(
-                data=data,  # the single embedding
-                limit=chunks,
-                filters=filters,  # metadata filtering
-                include_value=include_value,  # this returns the distance/score
-                include_metadata=include_metadata,  # this returns your metadata dict (with 'text')
+            return await self._search(
+                data, chunks, filters, include_value, include_metadata, ef_search
             )
-
-            # 'vecs' returns a list of result objects/tuples.
-            # structure: [(id, score, metadata), (id, score, metadata)...]
-
-            return results
-
         except Exception as e:
             print(f"Vecs Query Error: {e}")
             return []
 
-    async def delete_document_vectors(self, document_id: str):
+    def _quantized_expression(self, vector):
+        """The halfvec / binary code of `vector`, as indexed by _create_ann_index."""
+        if self.storage_format == "halfvec":
+            return cast(vector, HALFVEC(self.dimension))
+        return cast(func.binary_quantize(vector), BIT(self.dimension))
+
+    def _ann_index_name(self) -> str:
+        return f"ix_{self.table.name}_vec_{self.storage_format}_hnsw"
+
+    def _document_index_name(self) -> str:
+        return f"ix_{self.table.name}_document_id"
+
+    def _create_ann_index(self, existing: str | None = None):
+        """(Re)creates the HNSW index for the active storage format."""
+        if self.storage_format == "float32":
+            expression, opclass = "vec", "vector_cosine_ops"
+        elif self.storage_format == "halfvec":
+            expression, opclass = f"(vec::halfvec({self.dimension}))", "halfvec_cosine_ops"
+        else:
+            expression, opclass = f"(binary_quantize(vec)::bit({self.dimension}))", "bit_hamming_ops"
+
+        self._build_index(
+            self._ann_index_name(),
+            f"using hnsw ({expression} {opclass}) "
+            f"with (m = {self.index_m}, ef_construction = {self.index_ef_construction})",
+            # an older index may have another name (vecs names its own)
+            replaces=[existing],
+        )
+
+    def _document_index_expression(self) -> str:
+        # the typed column once migrated; before that the same expression as
+        # vecs' {"document_id": {"$eq"/"$in": ...}} metadata filters
+        return "(document_id)" if self.typed_columns else "((metadata -> 'document_id'))"
+
+    def _create_document_index(self):
+        # lets filtered queries and deletes only touch that document's rows
+        self._build_index(self._document_index_name(), self._document_index_expression())
+
+    def _build_index(self, name: str, definition: str, replaces: list[str | None] = ()):
         """
-        Deletes all vector chunks associated with a document by document_id.
-        Uses metadata filtering to find and delete chunks in batches of 1000
-        (database limit) since there may be more than 1000 chunks per document.
+        Builds index `name` without blocking reads or writes: CREATE INDEX
+        CONCURRENTLY under a temporary name, then the old index (and any in
+        `replaces`) is dropped concurrently and the new one renamed.
+        A partitioned table cannot be indexed concurrently, so there the
+        parent index is created ON ONLY the parent and each partition's index
+        is built concurrently and attached. Dropping the old partitioned index
+        briefly locks the table (no build happens under that lock).
         """
-        try:
-            batch_size = 1000
-            total_deleted = 0
-
-            while True:
-                # Query for chunks with this document_id (batch of 1000)
-                chunks_to_delete = self.collection.query(
-                    data=[0.0] * 768,  # dummy embedding (only used for filter)
-                    limit=batch_size,
-                    filters={"document_id": {"$eq": document_id}},
-                    include_metadata=True,
+        table = f'vecs."{self.table.name}"'
+        suffix = uuid4().hex[:8]
+        temporary = f"{name[:50]}_{suffix}"
+        built = []
+        with self.client.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            try:
+                if not self.partitioned:
+                    built.append(temporary)
+                    conn.execute(
+                        text(f'create index concurrently "{temporary}" on {table} {definition}')
+                    )
+                else:
+                    built.append(temporary)
+                    conn.execute(text(f'create index "{temporary}" on only {table} {definition}'))
+                    partitions = conn.execute(
+                        text(
+                            "select c.relname from pg_inherits i "
+                            "join pg_class c on c.oid = i.inhrelid "
+                            "where i.inhparent = cast(:table as regclass)"
+                        ),
+                        {"table": table},
+                    ).scalars().all()
+                    for partition in partitions:
+                        child = f"ix{partition[:44]}_{suffix}"
+                        built.append(child)
+                        conn.execute(
+                            text(
+                                f'create index concurrently "{child}" '
+                                f'on vecs."{partition}" {definition}'
+                            )
+                        )
+                        conn.execute(text(f'alter index vecs."{temporary}" attach partition vecs."{child}"'))
+            except Exception:
+                # leave no half-built (invalid) index behind
+                for index in reversed(built):
+                    conn.execute(text(f'drop index if exists vecs."{index}"'))
+                raise
+
+            drop = "drop index" if self.partitioned else "drop index concurrently"
+            for old in dict.fromkeys([*replaces, name]):
+                if old:
+                    conn.execute(text(f'{drop} if exists vecs."{old}"'))
+            conn.execute(text(f'alter index vecs."{temporary}" rename to "{name}"'))
+
+    def index_status(self) -> dict:
+        """
+        Reports the indexes the active storage format needs: the HNSW index
+        (and its build parameters) and the document_id btree.
+        """
+        with self.client.Session() as sess:
+            # valid indexes only: not one still being built concurrently
+            rows = sess.execute(
+                text(
+                    "select i.indexname, i.indexdef from pg_indexes i "
+                    "join pg_class c on c.relname = i.indexname "
+                    "and c.relnamespace = 'vecs'::regnamespace "
+                    "join pg_index x on x.indexrelid = c.oid "
+                    "where i.schemaname = 'vecs' and i.tablename = :table and x.indisvalid"
+                ),
+                {"table": self.table.name},
+            ).fetchall()
+
+        ann_name, ann_params = None, None
+        for name, definition in rows:
+            if (
+                "using hnsw" in definition.lower()
+                and _ANN_INDEX_SIGNATURE[self.storage_format] in definition
+            ):
+                ann_name = name
+                # pgvector defaults when the index was built without WITH (...)
+                ann_params = {"m": 16, "ef_construction": 64}
+                ann_params.update(
+                    {key: int(value) for key, value in _INDEX_PARAM.findall(definition)}
                 )
+        expected_params = {"m": self.index_m, "ef_construction": self.index_ef_construction}
 
-                # If no more chunks, we're done
-                if not chunks_to_delete:
-                    break
+        document_index = dict(rows).get(self._document_index_name())
+        if document_index is None:
+            has_document_index = False
+        elif self.typed_columns:
+            # the metadata expression index from before the migration is unused now
+            has_document_index = "metadata" not in document_index
+        else:
+            has_document_index = True
 
-                # Extract chunk IDs and delete them
-                chunk_ids = [chunk[0] for chunk in chunks_to_delete]
-                self.collection.delete(ids=chunk_ids)
-                total_deleted += len(chunk_ids)
-                print(
-                    f"Deleted {len(chunk_ids)} vector chunks (total: {total_deleted}) for document {document_id}"
+        return {
+            "collection": self.table.name,
+            "storage_format": self.storage_format,
+            "typed_columns": self.typed_columns,
+            "partitioned": self.partitioned,
+            "ann_index": ann_name,
+            "ann_params": ann_params,
+            "expected_ann_params": expected_params,
+            "document_id_index": self._document_index_name() if has_document_index else None,
+            "ok": ann_params == expected_params and has_document_index,
+        }
+
+    def ensure_indexes(self, create: bool = VECTOR_INDEX_AUTOCREATE) -> dict:
+        """
+        Startup check: creates missing indexes (when `create` is set) and
+        reports HNSW indexes built with other parameters than configured;
+        those are only replaced by rebuild_indexes().
+        """
+        status = self.index_status()
+        if create and status["document_id_index"] is None:
+            print(f"Creating {self._document_index_name()}...")
+            self._create_document_index()
+        if create and status["ann_index"] is None:
+            print(f"Creating HNSW index on {self.table.name} ({self.storage_format})...")
+            self._create_ann_index()
+        if create:
+            status = self.index_status()
+
+        if not status["ok"]:
+            print(f"Vector index check: {status}")
+        return status
+
+    def rebuild_indexes(self) -> dict:
+        """
+        Rebuilds the HNSW index with the configured parameters and the
+        document_id btree (see _build_index): reads and writes go on while
+        the new indexes are built; queries use the old ones until the swap.
+        """
+        self._create_ann_index(existing=self.index_status()["ann_index"])
+        self._create_document_index()
+        print(f"Rebuilt vector indexes on {self.table.name}")
+        # approximate results may differ with the new index
+        with self.client.Session() as sess:
+            with sess.begin():
+                sess.execute(self._notify(None))
+        self._changed(None)
+        return self.index_status()
+
+    def _nearest(
+        self,
+        query_vec,
+        limit: int,
+        filters: dict[str, any],
+        include_value: bool,
+        include_metadata: bool,
+        exact: bool = False,
+    ):
+        """
+        SELECT of the `limit` chunks nearest to `query_vec` by cosine distance.
+        In the quantized formats this is two-stage: the quantized index
+        returns limit x rerank_factor candidates, which are reranked by exact
+        cosine distance on `vec`.
+        With `exact`, the filtered rows are read first (a materialized CTE,
+        so through the document_id index rather than the HNSW index) and
+        all of them are ranked.
+        """
+        table = self.table
+        if exact:
+            source = select(table.c.id, table.c.vec, table.c["metadata"])
+            if filters:
+                source = source.where(self._build_filters(filters))
+            source = source.cte("matching").prefix_with("materialized")
+        elif self.storage_format == "float32":
+            source = select(table.c.id, table.c.vec, table.c["metadata"])
+            if filters:
+                source = source.where(self._build_filters(filters))
+            source = source.subquery()
+        else:
+            code = self._quantized_expression(table.c.vec)
+            query_code = self._quantized_expression(query_vec)
+            candidates = select(table.c.id, table.c.vec, table.c["metadata"])
+            if filters:
+                candidates = candidates.where(self._build_filters(filters))
+            source = (
+                candidates.order_by(
+                    code.cosine_distance(query_code)
+                    if self.storage_format == "halfvec"
+                    else code.hamming_distance(query_code)
                 )
+                .limit(self._n_candidates(limit))
+                .subquery()
+            )
 
-                # If we got fewer than batch_size, we've deleted all chunks
-                if len(chunk_ids) < batch_size:
-                    break
+        distance = source.c.vec.cosine_distance(query_vec)
+        cols = [source.c.id]
+        if include_value:
+            cols.append(distance.label("distance"))
+        if include_metadata:
+            cols.append(source.c["metadata"])
+        return select(*cols).order_by(distance).limit(limit)
 
-            print(
-                f"Completed: Deleted {total_deleted} total vector chunks for document {document_id}"
+    def _n_candidates(self, limit: int) -> int:
+        return min(1000, limit * self.rerank_factor)
+
+    def _search_ef(self, limit: int, ef_search: int) -> int:
+        if self.storage_format != "float32":
+            # the index has to return every candidate
+            ef_search = max(ef_search, self._n_candidates(limit))
+        return max(1, min(_MAX_EF_SEARCH, ef_search))
+
+    async def _prepare_search(self, conn, filters: dict, limit: int, ef_search: int) -> bool:
+        """
+        Sets the hnsw settings for a search on `conn`; returns True when it
+        should be exact instead (see VECTOR_EXACT_SCAN_MAX_ROWS).
+        """
+        exact, ef_search = await self._plan_search(conn, filters, limit, ef_search)
+        if exact:
+            return True
+        settings = [func.set_config("hnsw.ef_search", str(ef_search), True)]
+        if self.iterative_scan:
+            # quantized candidates are reranked exactly anyway
+            order = "strict_order" if self.storage_format == "float32" else "relaxed_order"
+            settings.append(func.set_config("hnsw.iterative_scan", order, True))
+        await conn.execute(select(*settings))
+        return False
+
+    async def _plan_search(self, conn, filters: dict, limit: int, ef_search: int) -> tuple[bool, int]:
+        """(exact, ef_search) for a search with `filters`."""
+        ef_search = self._search_ef(limit, ef_search)
+        if not filters:
+            return False, ef_search
+
+        matching = (
+            select(literal(1))
+            .select_from(self.table)
+            .where(self._build_filters(filters))
+            .limit(VECTOR_EXACT_SCAN_MAX_ROWS + 1)
+            .subquery()
+        )
+        rows = (await conn.execute(select(func.count()).select_from(matching))).scalar()
+        if rows <= VECTOR_EXACT_SCAN_MAX_ROWS:
+            metrics.increment("vector_search.exact")
+            return True, ef_search
+        if self.iterative_scan:
+            return False, ef_search
+
+        # without iterative scan about ef_search x (rows / total) candidates
+        # survive the filter; ask for twice what is needed
+        total = (
+            await conn.execute(
+                text(
+                    "select coalesce(sum(greatest(c.reltuples, 0)), 0) from pg_class c "
+                    "where c.oid = cast(:table as regclass) or c.oid in "
+                    "(select inhrelid from pg_inherits where inhparent = cast(:table as regclass))"
+                ),
+                {"table": f'vecs."{self.table.name}"'},
             )
+        ).scalar()
+        needed = 2 * max(limit, self._n_candidates(limit)) * total / rows
+        if needed > _MAX_EF_SEARCH:
+            metrics.increment("vector_search.exact")
+            return True, ef_search
+        return False, max(ef_search, int(needed))
+
+    def _query_vector(self, data: list[float]):
+        vector_type = AsyncpgVector(self.dimension)
+        return cast(literal(data, vector_type), vector_type)
+
+    async def _search(
+        self,
+        data: list[float],
+        limit: int,
+        filters: dict[str, any],
+        include_value: bool,
+        include_metadata: bool,
+        ef_search: int,
+    ):
+        async with self._connection() as conn:
+            exact = await self._prepare_search(conn, filters, limit, ef_search)
+            stmt = self._nearest(
+                self._query_vector(data), limit, filters, include_value, include_metadata, exact
+            )
+            result = await conn.execute(stmt)
+            if not (include_value or include_metadata):
+                return [str(x) for x in result.scalars().all()]
+            return result.fetchall() or []
+
+    async def query_many(
+        self,
+        data: list[list[float]],
+        chunks: int,
+        filters: dict[str, any],
+        include_value: bool = False,
+        include_metadata: bool = True,
+        ef_search: int | None = None,
+    ) -> list[list[tuple[str, float, dict[str, any]]]]:
+        """
+        Like query, for several query vectors at once: one statement that
+        LATERAL-joins the per-vector nearest-chunk search onto the list of
+        vectors, so N topics cost one round trip instead of N.
+        Returns one result list per vector, in input order.
+        """
+        if not data:
+            return []
+        ef_search = ef_search or self.ef_search
+        try:
+            return await self._search_many(
+                data, chunks, filters, include_value, include_metadata, ef_search
+            )
+        except Exception as e:
+            print(f"Vecs Query Error: {e}")
+            return [[] for _ in data]
+
+    async def _search_many(
+        self,
+        data: list[list[float]],
+        limit: int,
+        filters: dict[str, any],
+        include_value: bool,
+        include_metadata: bool,
+        ef_search: int,
+    ):
+        # (ord, vec) rows; each vector is its own cast bind parameter, since
+        # asyncpg does not take a list of vectors as a vector[] argument
+        queries = union_all(
+            *(
+                select(literal(i).label("ord"), self._query_vector(vec).label("vec"))
+                for i, vec in enumerate(data)
+            )
+        ).subquery("queries")
+
+        results = [[] for _ in data]
+        async with self._connection() as conn:
+            exact = await self._prepare_search(conn, filters, limit, ef_search)
+            hits = self._nearest(
+                queries.c.vec, limit, filters, True, include_metadata, exact
+            ).lateral("hits")
+            cols = [hits.c.id]
+            if include_value:
+                cols.append(hits.c.distance)
+            if include_metadata:
+                cols.append(hits.c["metadata"])
+            stmt = (
+                select(queries.c.ord, *cols)
+                .select_from(queries.join(hits, true()))
+                .order_by(queries.c.ord, hits.c.distance)
+            )
+            for ord_, *row in (await conn.execute(stmt)).fetchall():
+                results[ord_].append(str(row[0]) if len(row) == 1 else tuple(row))
+        return results
+
+    async def purge_document_vectors(self, document_ids: list[str]) -> int:
+        """
+        Deletes every chunk of the given documents with a single filtered
+        DELETE (one transaction), using the document_id index / partitions.
+        Returns the number of chunks deleted.
+        """
+        if not document_ids:
+            return 0
+        # a large purge may outlast the request statement timeout
+        async with self._connection(statement_timeout_ms=0) as conn:
+            result = await conn.execute(
+                delete(self.table).where(
+                    self._build_filters({"document_id": {"$in": list(document_ids)}})
+                )
+            )
+            deleted = result.rowcount
+            await conn.execute(self._notify(list(document_ids)))
+        self._changed(list(document_ids))
+        print(f"Deleted {deleted} vector chunks for {len(document_ids)} document(s)")
+        return deleted
+
+    async def delete_document_vectors(self, document_id: str):
+        """
+        Deletes all vector chunks associated with a document by document_id.
+        """
+        try:
+            await self.purge_document_vectors([document_id])
         except Exception as e:
             print(f"Vector delete warning: {e}")
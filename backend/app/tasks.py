@@ -1,9 +1,314 @@
 from supabase import Client
 from app.services.vector_db_service import VectorDBService
 from app.services.embedding_service import EmbeddingService
-from app.utils.pdf_processor import pdf_process_to_chunks
-from app.utils.pptx_processor import pptx_process_to_chunks
+from app.utils.batch_tuner import TokenBudgetTuner
+from app.utils.extraction import extract_pages, pages_to_chunks
+import asyncio
+import hashlib
 import os
+import time
+from typing import Awaitable, Callable
+
+# Ingestion pipeline tuning: embedding requests are packed up to a token
+# budget (and at most INGEST_BATCH_SIZE chunks), and INGEST_EMBED_CONCURRENCY
+# of them may be in flight while earlier batches are being upserted.
+INGEST_BATCH_TOKENS = int(os.getenv("INGEST_BATCH_TOKENS", "8192"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "3"))
+# Adapt the token budget to observed latency per token (see TokenBudgetTuner)
+INGEST_BATCH_AUTOTUNE = os.getenv("INGEST_BATCH_AUTOTUNE", "false").lower() == "true"
+# Upper bound on rows per upsert when most of a batch comes from the embedding store
+INGEST_MAX_BATCH_ROWS = 500
+
+# shared by every document ingested in this process, so tuning carries over
+_budget_tuner = TokenBudgetTuner(INGEST_BATCH_TOKENS) if INGEST_BATCH_AUTOTUNE else None
+
+
+async def _timed(coro, stats: dict, key: str):
+    """Awaits a coroutine and adds its wall time to stats[key]."""
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        stats[key] += time.perf_counter() - started
+
+
+def _chunk_tokens(chunk: dict) -> int:
+    # the chunker records each chunk's token count; estimate if it is missing
+    return chunk.get("token_count") or len(chunk["text"]) // 4 + 1
+
+
+async def _embed_missing(
+    document_id: str,
+    batch: list[dict],
+    stored: list[list[float] | None],
+    embedding_service: EmbeddingService,
+    stats: dict,
+) -> list[list[float]]:
+    """Embeds (and stores) only the chunks without a stored embedding."""
+    missing = [i for i, vec in enumerate(stored) if vec is None]
+    embeddings = list(stored)
+    if not missing:
+        return embeddings
+
+    tokens = sum(_chunk_tokens(batch[i]) for i in missing)
+    request_seconds = []
+    started = time.perf_counter()
+    fresh = await embedding_service.embed_chunks(
+        [batch[i]["text"] for i in missing], store=True, on_latency=request_seconds.append
+    )
+    seconds = time.perf_counter() - started
+    # the tuner models the API's latency per token, so it gets the request
+    # time alone (not rate-governor queueing or the store write)
+    request = request_seconds[-1] if request_seconds else seconds
+
+    stats["embedded_tokens"] += tokens
+    if _budget_tuner is not None:
+        _budget_tuner.observe(tokens, request)
+    print(
+        f"Embedded {len(missing)} chunks / {tokens} tokens for doc {document_id} in {seconds:.2f}s, "
+        f"{request:.2f}s in the request "
+        f"({tokens / request if request > 0 else 0:.0f} tokens/s, {request * 1000 / tokens:.2f} ms/token)"
+    )
+
+    for i, vec in zip(missing, fresh):
+        embeddings[i] = vec
+    return embeddings
+
+
+async def _embed_stage(
+    document_id: str,
+    chunks: list[dict],
+    stored: list[list[float] | None],
+    start_at: int,
+    batch_size: int,
+    batch_tokens: int,
+    embedding_service: EmbeddingService,
+    in_flight: asyncio.Semaphore,
+    queue: asyncio.Queue,
+    stats: dict,
+):
+    """
+    Producer: packs the chunks that still need embedding into batches of up to
+    `batch_tokens` tokens and `batch_size` chunks (a single oversized chunk
+    goes alone; chunks found in the embedding store ride along, up to
+    INGEST_MAX_BATCH_ROWS per batch), starts an embedding request per batch
+    (at most `in_flight` at once) and hands the pending results to the upsert
+    stage in chunk order.
+    """
+    start = start_at
+    while start < len(chunks):
+        budget = _budget_tuner.budget if _budget_tuner is not None else batch_tokens
+        end, missing, tokens = start, 0, 0
+        while end < len(chunks) and end - start < INGEST_MAX_BATCH_ROWS:
+            if stored[end] is None:
+                cost = _chunk_tokens(chunks[end])
+                if missing and (missing >= batch_size or tokens + cost > budget):
+                    break
+                missing += 1
+                tokens += cost
+            end += 1
+
+        batch = chunks[start:end]
+        await in_flight.acquire()
+        task = asyncio.create_task(
+            _timed(
+                _embed_missing(
+                    document_id,
+                    batch,
+                    stored[start:end],
+                    embedding_service,
+                    stats,
+                ),
+                stats,
+                "embed_seconds",
+            )
+        )
+        task.add_done_callback(lambda _: in_flight.release())
+        try:
+            await queue.put((start, batch, task))
+        except asyncio.CancelledError:
+            # cancelled while the queue was full: the task never reached the
+            # consumer, so nothing else would cancel it
+            task.cancel()
+            raise
+        start = end
+    await queue.put(None)
+
+
+async def _upsert_stage(
+    document_id: str,
+    file_hash: str,
+    vector_service: VectorDBService,
+    queue: asyncio.Queue,
+    stats: dict,
+    on_batch_committed: Callable[[int], Awaitable[None]] | None,
+):
+    """
+    Consumer: waits for each batch's embeddings in order and writes them to
+    pgvector while the next batches are still being embedded.
+    Since batches commit in order, `on_batch_committed(end_index)` receives
+    a high-water mark: every chunk below it is stored.
+    """
+    batch_number = 0
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+
+        start, batch, task = item
+        embeddings = await task
+        batch_number += 1
+        print(
+            f"Indexing batch {batch_number} for doc {document_id} ({len(batch)} chunks)..."
+        )
+        await _timed(
+            vector_service.upsert_chunks(
+                chunks=batch,
+                embeddings=embeddings,
+                file_hash=file_hash,
+                document_id=document_id,
+                start_index=start,
+            ),
+            stats,
+            "upsert_seconds",
+        )
+        stats["indexed"] += len(batch)
+        if on_batch_committed is not None:
+            await on_batch_committed(start + len(batch))
+
+
+async def index_chunks(
+    document_id: str,
+    file_hash: str,
+    chunks: list[dict],
+    vector_service: VectorDBService,
+    embedding_service: EmbeddingService,
+    batch_size: int = INGEST_BATCH_SIZE,
+    batch_tokens: int = INGEST_BATCH_TOKENS,
+    embed_concurrency: int = INGEST_EMBED_CONCURRENCY,
+    start_at: int = 0,
+    on_batch_committed: Callable[[int], Awaitable[None]] | None = None,
+) -> int:
+    """
+    Embeds and upserts chunks as a two-stage pipeline so that batch N+1 is
+    being embedded while batch N is written. Chunk ids stay `{file_hash}_{index}`.
+    Chunks before `start_at` are assumed to be stored already and are skipped.
+    Embeddings already in the embedding store are looked up in bulk up front,
+    and only the misses are sent to the embedding API.
+    Returns the number of chunks indexed by this call.
+    """
+    stats = {
+        "indexed": 0,
+        "embedded_tokens": 0,
+        "embed_seconds": 0.0,
+        "upsert_seconds": 0.0,
+    }
+    stored = [None] * start_at + await embedding_service.get_stored(
+        [chunk["text"] for chunk in chunks[start_at:]]
+    )
+    store_hits = sum(1 for vec in stored if vec is not None)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, embed_concurrency))
+    in_flight = asyncio.Semaphore(max(1, embed_concurrency))
+    started = time.perf_counter()
+
+    producer = asyncio.create_task(
+        _embed_stage(
+            document_id,
+            chunks,
+            stored,
+            start_at,
+            batch_size,
+            batch_tokens,
+            embedding_service,
+            in_flight,
+            queue,
+            stats,
+        )
+    )
+    try:
+        await _upsert_stage(
+            document_id,
+            file_hash,
+            vector_service,
+            queue,
+            stats,
+            on_batch_committed,
+        )
+        await producer
+    finally:
+        # on failure, stop the producer and any embedding requests still queued
+        if not producer.done():
+            producer.cancel()
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+    wall = time.perf_counter() - started
+    indexed = stats["indexed"]
+
+    def rate(seconds: float) -> str:
+        return f"{indexed / seconds:.1f} chunks/s" if seconds > 0 else "n/a"
+
+    print(
+        f"Ingestion throughput for doc {document_id}: {indexed} chunks in {wall:.2f}s "
+        f"({rate(wall)}); embed stage {stats['embed_seconds']:.2f}s busy ({rate(stats['embed_seconds'])}), "
+        f"upsert stage {stats['upsert_seconds']:.2f}s busy ({rate(stats['upsert_seconds'])}); "
+        f"{store_hits} embeddings reused from the store, "
+        f"{stats['embedded_tokens']} tokens embedded"
+        + (f"; token budget now {_budget_tuner.budget}" if _budget_tuner is not None else "")
+    )
+    return indexed
+
+
+def _chunk_digest(chunks: list[dict]) -> str:
+    """Identifies a chunking result, so checkpoints are only reused for identical chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(f"{chunk['page_number']}\x1f{chunk['text']}\x1e".encode())
+    return digest.hexdigest()
+
+
+def _resume_point(
+    db_client: Client, document_id: str, chunk_count: int, chunk_digest: str
+) -> int:
+    """
+    Returns the checkpointed high-water mark when it belongs to the same
+    chunking; otherwise records a fresh checkpoint and returns 0.
+    """
+    res = (
+        db_client.table("documents")
+        .select("indexed_chunks, chunk_count, chunk_digest")
+        .eq("id", document_id)
+        .maybe_single()
+        .execute()
+    )
+    checkpoint = res.data if res else None
+
+    if (
+        checkpoint
+        and checkpoint.get("chunk_digest") == chunk_digest
+        and checkpoint.get("chunk_count") == chunk_count
+    ):
+        return min(checkpoint.get("indexed_chunks") or 0, chunk_count)
+
+    db_client.table("documents").update(
+        {"indexed_chunks": 0, "chunk_count": chunk_count, "chunk_digest": chunk_digest}
+    ).eq("id", document_id).execute()
+    return 0
+
+
+def _set_status(db_client: Client, document_id: str, status: str):
+    db_client.table("documents").update({"status": status}).eq("id", document_id).execute()
+
+
+def _fetch_chunks(db_client: Client, file_path: str, file_ext: str, file_hash: str) -> list[dict]:
+    # fetch the file from Supabase Storage
+    file_bytes = db_client.storage.from_("pdfs").download(file_path)
+    pages = extract_pages(file_bytes, file_ext)
+    chunks, _ = pages_to_chunks(pages, file_ext, file_hash)
+    return chunks
 
 
 async def process_document(
@@ -13,64 +318,74 @@ async def process_document(
     db_client: Client,
     vector_service: VectorDBService,
     embedding_service: EmbeddingService,
+    chunks: list[dict] | None = None,
+    raise_errors: bool = False,
 ):
+    """
+    Chunks, embeds and indexes a document.
+    `chunks` are the chunks already produced during upload; when they are not
+    given (e.g. recovering a document later) the file is fetched from Storage,
+    parsed and chunked.
+    With `raise_errors`, failures are re-raised after the document is marked
+    'failed' (the ingestion worker uses this to decide whether to retry).
+    Supabase calls, the download and parsing run in threads, so they do not
+    stall the event loop (in the worker, other jobs and their lease renewals).
+    """
     try:
         # update document status to 'processing'
-        db_client.table("documents").update({"status": "processing"}).eq(
-            "id", document_id
-        ).execute()
-
-        # fetch the file from Supabase Storage
-        file_bytes = db_client.storage.from_("pdfs").download(file_path)
+        await asyncio.to_thread(_set_status, db_client, document_id, "processing")
 
         # Determine which processor to use based on extension
         file_ext = os.path.splitext(file_path)[1].lower()
 
-        if file_ext == ".pdf":
-            chunks = pdf_process_to_chunks(file_bytes, file_hash)
-        elif file_ext == ".pptx":
-            chunks = pptx_process_to_chunks(file_bytes, file_hash)
-        else:
-            raise ValueError(f"Unsupported file extension: {file_ext}")
+        if chunks is None:
+            chunks = await asyncio.to_thread(
+                _fetch_chunks, db_client, file_path, file_ext, file_hash
+            )
 
-        batch_size = 20
         total_chunks = len(chunks)
-        total_indexed = 0
 
-        print(f"Total chunks to index for doc {document_id}: {total_chunks}")
-        db_client.table("documents").update({"status": "indexing"}).eq(
-            "id", document_id
-        ).execute()
+        # resume after the last committed batch of a previous, failed run
+        resume_from = await asyncio.to_thread(
+            _resume_point, db_client, document_id, total_chunks, _chunk_digest(chunks)
+        )
 
-        for i in range(0, total_chunks, batch_size):
-            batch = chunks[i : i + batch_size]
-            batch_texts = [chunk["text"] for chunk in batch]
+        print(f"Total chunks to index for doc {document_id}: {total_chunks}")
+        if resume_from:
             print(
-                f"Indexing batch {i // batch_size + 1} for doc {document_id} ({len(batch)} chunks)..."
+                f"Resuming doc {document_id} from chunk {resume_from} ({resume_from} already indexed)"
             )
-            embeddings = await embedding_service.embed_chunks(batch_texts)
-            await vector_service.upsert_chunks(
-                chunks=batch,
-                embeddings=embeddings,
-                file_hash=file_hash,
-                document_id=document_id,
-                start_index=i,
+        await asyncio.to_thread(_set_status, db_client, document_id, "indexing")
+
+        async def save_checkpoint(high_water_mark: int):
+            await asyncio.to_thread(
+                lambda: db_client.table("documents")
+                .update({"indexed_chunks": high_water_mark})
+                .eq("id", document_id)
+                .execute()
             )
-            total_indexed += len(batch_texts)
+
+        total_indexed = await index_chunks(
+            document_id=document_id,
+            file_hash=file_hash,
+            chunks=chunks,
+            vector_service=vector_service,
+            embedding_service=embedding_service,
+            start_at=resume_from,
+            on_batch_committed=save_checkpoint,
+        )
 
         print(
             f"Successfully embedded and upserted {total_indexed} vectors for doc {document_id}."
         )
 
         # 5. Update document status to 'ready'
-        db_client.table("documents").update({"status": "ready"}).eq(
-            "id", document_id
-        ).execute()
+        await asyncio.to_thread(_set_status, db_client, document_id, "ready")
         print(f"Background processing completed for document: {document_id}")
 
     except Exception as e:
         print(f"Background processing failed for document {document_id}: {e}")
         # Update document status to 'failed' on error
-        db_client.table("documents").update({"status": "failed"}).eq(
-            "id", document_id
-        ).execute()
+        await asyncio.to_thread(_set_status, db_client, document_id, "failed")
+        if raise_errors:
+            raise
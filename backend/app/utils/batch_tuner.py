@@ -0,0 +1,42 @@
+class TokenBudgetTuner:
+    """
+    Adjusts the token budget of ingestion embedding batches from observed
+    latency. Bigger batches amortize the per-request overhead, so the budget
+    keeps growing while the cost per token stays close to the best seen and
+    batches finish within `latency_target`; it backs off when batches get
+    slow or per-token cost climbs (the provider is queueing or throttling).
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        min_budget: int = 1024,
+        max_budget: int = 32768,
+        latency_target: float = 5.0,
+    ):
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.budget = max(min_budget, min(max_budget, budget))
+        self.latency_target = latency_target
+        self.seconds_per_token: float | None = None  # EWMA
+        self.best_seconds_per_token: float | None = None
+
+    def observe(self, tokens: int, seconds: float):
+        if tokens <= 0 or seconds <= 0:
+            return
+
+        sample = seconds / tokens
+        if self.seconds_per_token is None:
+            self.seconds_per_token = sample
+        else:
+            self.seconds_per_token = 0.7 * self.seconds_per_token + 0.3 * sample
+        if self.best_seconds_per_token is None or self.seconds_per_token < self.best_seconds_per_token:
+            self.best_seconds_per_token = self.seconds_per_token
+
+        if seconds > self.latency_target:
+            factor = 0.7
+        elif self.seconds_per_token <= self.best_seconds_per_token * 1.1:
+            factor = 1.25
+        else:
+            factor = 0.9
+        self.budget = int(max(self.min_budget, min(self.max_budget, self.budget * factor)))
@@ -0,0 +1,100 @@
+import os
+import re
+
+import numpy as np
+import xxhash
+
+# A normalized line is boilerplate (running header/footer, page number,
+# slide template text) when it shows up on at least this fraction of the
+# pages, and on no fewer than BOILERPLATE_MIN_PAGES of them.
+BOILERPLATE_MIN_PAGE_FRACTION = float(os.getenv("BOILERPLATE_MIN_PAGE_FRACTION", "0.5"))
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+
+_DIGITS = re.compile(r"\d+")
+_LETTER = re.compile(r"[^\W\d_]")
+_WHITESPACE = re.compile(r"\s+")
+# a bare page number ("12", "- 12 -", "12 / 40"); only stripped as the first
+# or last line of a page (see strip_boilerplate)
+_PAGE_NUMBER = re.compile(r"[^\w]*\d{1,4}(?:\s*/\s*\d{1,4})?[^\w]*")
+
+
+def line_fingerprint(line: str) -> int:
+    """
+    64-bit hash of a line with whitespace removed and case folded. In lines
+    with letters digit runs are masked, so "Page 12 of 400" and "Page 13 of
+    400" share a fingerprint; purely numeric lines (table rows, figures) are
+    hashed as they are, or they would all count as one repeated line.
+    """
+    if _LETTER.search(line):
+        line = _DIGITS.sub("#", line)
+    return xxhash.xxh64_intdigest(_WHITESPACE.sub("", line).lower())
+
+
+def _page_number_positions(lines: list[str]) -> list[int]:
+    """Indices of the first/last line of a page when they are bare page numbers."""
+    edges = {0, len(lines) - 1} if lines else set()
+    return sorted(i for i in edges if _PAGE_NUMBER.fullmatch(lines[i].strip()))
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency counter (depth x width uint32 counters, 1 MiB with
+    the defaults) for 64-bit hashes. Estimates never undercount, and memory
+    does not grow with the number of distinct lines in the document.
+    """
+
+    def __init__(self, width: int = 1 << 16, depth: int = 4):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # double hashing: row i uses h1 + i * h2
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.table.shape[0], dtype=np.uint64)[:, None]
+        return ((h1 + rows * h2) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, hashes: np.ndarray):
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, 1)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        columns = self._columns(hashes)
+        rows = np.arange(self.table.shape[0])[:, None]
+        return self.table[rows, columns].min(axis=0)
+
+
+def strip_boilerplate(pages: list[list[str]]) -> list[list[str]]:
+    """
+    Removes lines that repeat across many pages (with digits masked in lines
+    that have letters), and bare page numbers at the top or bottom of pages
+    when enough pages have one there. `pages` holds the non-empty lines of
+    each page; counts are per page (document frequency), so a line repeated
+    within one page is not affected.
+    """
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_PAGE_FRACTION * len(pages))
+    if len(pages) < threshold:
+        return pages
+
+    fingerprints = [
+        np.fromiter((line_fingerprint(line) for line in lines), dtype=np.uint64, count=len(lines))
+        for lines in pages
+    ]
+
+    sketch = CountMinSketch()
+    for page_fingerprints in fingerprints:
+        sketch.add(np.unique(page_fingerprints))
+
+    page_numbers = [_page_number_positions(lines) for lines in pages]
+    if sum(1 for positions in page_numbers if positions) < threshold:
+        page_numbers = [[] for _ in pages]
+
+    stripped = []
+    for lines, page_fingerprints, positions in zip(pages, fingerprints, page_numbers):
+        if not lines:
+            stripped.append(lines)
+            continue
+        keep = sketch.estimate(page_fingerprints) < threshold
+        keep[positions] = False
+        stripped.append([line for line, kept in zip(lines, keep) if kept])
+    return stripped
@@ -0,0 +1,127 @@
+import os
+from collections import deque
+
+from app.utils.token_chunker import get_encoding
+
+# Tokens of retrieved text sent to the LLM per assessment (cl100k count, so
+# approximate for Gemini). Replaces the old fixed chunk count as the limit.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+# per "--- SOURCE n (ID: ... | PAGE: ...) ---" header
+_HEADER_TOKENS = 24
+# shortest text accepted as the overlap between two adjacent chunks
+_MIN_OVERLAP_CHARS = 16
+
+
+def overlap_length(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`."""
+    probe = b[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+def _merge_runs(chunks: list[dict]) -> list[dict]:
+    """
+    Joins chunks with consecutive chunk_index on the same document page into
+    one span, dropping the token overlap the chunker repeats between them.
+    (Chunks never overlap across pages, and a span keeps a single page for
+    attribution.)
+    """
+    def position(chunk):
+        metadata = chunk["metadata"]
+        index = metadata.get("chunk_index")
+        return (
+            str(metadata.get("document_id")),
+            metadata.get("page_number") or 0,
+            -1 if index is None else index,
+        )
+
+    spans = []
+    for chunk in sorted(chunks, key=position):
+        metadata = chunk["metadata"]
+        text = metadata.get("text") or ""
+        if not text.strip():
+            continue
+        document_id, page_number, index = position(chunk)
+        prev = spans[-1] if spans else None
+        if (
+            prev is not None
+            and index >= 0
+            and (prev["document_id"], prev["page_number"]) == (document_id, page_number)
+            and prev["last_index"] + 1 == index
+        ):
+            prev["text"] += text[overlap_length(prev["text"], text):]
+            prev["last_index"] = index
+            prev["chunk_ids"].append(chunk["id"])
+            for topic, score in chunk["scores"].items():
+                prev["scores"][topic] = max(prev["scores"].get(topic, score), score)
+            continue
+        spans.append(
+            {
+                "document_id": metadata.get("document_id", "unknown"),
+                "page_number": metadata.get("page_number"),
+                "last_index": index,
+                "chunk_ids": [chunk["id"]],
+                "text": text,
+                "scores": dict(chunk["scores"]),
+            }
+        )
+    return spans
+
+
+def pack_context(retrieved: list[list[dict]], token_budget: int = CONTEXT_TOKEN_BUDGET) -> list[list[dict]]:
+    """
+    Selects what to send to the LLM from per-topic retrieval results
+    ({"id", "score", "metadata"} per chunk):
+      1. a chunk retrieved for several topics is kept once, under the topic
+         it scored best for,
+      2. adjacent chunks are merged into spans (see _merge_runs),
+      3. spans are taken round-robin across topics, best score first, while
+         they fit in `token_budget`.
+    Returns the selected spans per topic, in score order.
+    """
+    chunks = {}
+    for topic, topic_chunks in enumerate(retrieved):
+        for chunk in topic_chunks:
+            entry = chunks.setdefault(
+                chunk["id"], {"id": chunk["id"], "metadata": chunk["metadata"], "scores": {}}
+            )
+            entry["scores"][topic] = max(entry["scores"].get(topic, chunk["score"]), chunk["score"])
+
+    encoding = get_encoding()
+    queues = [[] for _ in retrieved]
+    for span in _merge_runs(list(chunks.values())):
+        span["tokens"] = _HEADER_TOKENS + len(
+            encoding.encode(span["text"], allowed_special=set(), disallowed_special=())
+        )
+        owner = max(span["scores"], key=span["scores"].get)
+        span["score"] = span["scores"][owner]
+        queues[owner].append(span)
+    queues = [deque(sorted(q, key=lambda s: s["score"], reverse=True)) for q in queues]
+
+    selected = [[] for _ in retrieved]
+    used = 0
+    while any(queues):
+        for topic, queue in enumerate(queues):
+            # this topic's best remaining span that still fits
+            while queue:
+                span = queue.popleft()
+                if used + span["tokens"] <= token_budget:
+                    selected[topic].append(span)
+                    used += span["tokens"]
+                    break
+    return selected
+
+
+def format_sources(spans: list[dict], start: int = 1) -> str:
+    """Spans as numbered SOURCE blocks (the format the LLM prompt cites)."""
+    return "\n\n".join(
+        f"--- SOURCE {start + i} (ID: {span['document_id']} | PAGE: {span['page_number']}) ---\n"
+        f"{span['text'].strip()}"
+        for i, span in enumerate(spans)
+    )
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+# nomic-embed-text-v1.5 returns 768 dimensions, but it is Matryoshka-trained:
+# a renormalized prefix of the vector (down to 64 dims) is still a usable
+# embedding. EMBEDDING_DIMENSION is the size that is stored and searched.
+EMBEDDING_FULL_DIMENSION = 768
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", str(EMBEDDING_FULL_DIMENSION)))
+
+if not 64 <= EMBEDDING_DIMENSION <= EMBEDDING_FULL_DIMENSION:
+    raise ValueError(
+        f"EMBEDDING_DIMENSION must be between 64 and {EMBEDDING_FULL_DIMENSION}, got {EMBEDDING_DIMENSION}"
+    )
+
+
+def chunk_collection_name(dimension: int = EMBEDDING_DIMENSION) -> str:
+    """vecs collection holding document chunks at the given dimension."""
+    # the original full-size collection keeps its name
+    if dimension == EMBEDDING_FULL_DIMENSION:
+        return "document_chunks"
+    return f"document_chunks_{dimension}"
+
+
+def truncate_embeddings(
+    vectors: list[list[float]], dimension: int = EMBEDDING_DIMENSION
+) -> list[list[float]]:
+    """
+    Matryoshka truncation as recommended for nomic-embed-text-v1.5:
+    layer norm over the full vector, keep the first `dimension` values,
+    then L2-normalize. Full-size vectors are returned unchanged.
+    """
+    if not vectors or dimension >= len(vectors[0]):
+        return vectors
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    mean = matrix.mean(axis=1, keepdims=True)
+    var = matrix.var(axis=1, keepdims=True)
+    matrix = (matrix - mean) / np.sqrt(var + 1e-5)
+
+    matrix = matrix[:, :dimension]
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix.tolist()
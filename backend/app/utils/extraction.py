@@ -0,0 +1,31 @@
+from app.utils.pdf_processor import pdf_extract_pages, pdf_process_to_chunks
+from app.utils.pptx_processor import pptx_extract_slides, pptx_process_to_chunks
+
+
+def extract_pages(
+    file_bytes: bytes | memoryview, file_ext: str, file_path: str | None = None
+) -> list[str]:
+    """
+    Extracts per-page (or per-slide) text for a supported file extension.
+    `file_path` (the same content on disk) lets large PDFs be split across
+    worker processes.
+    """
+    if file_ext == ".pdf":
+        return pdf_extract_pages(file_bytes, file_path=file_path)
+    if file_ext == ".pptx":
+        return pptx_extract_slides(file_bytes)
+    raise ValueError(f"Unsupported file extension: {file_ext}")
+
+
+def pages_to_chunks(
+    pages: list[str], file_ext: str, file_hash: str
+) -> tuple[list[dict], int]:
+    """
+    Chunks already-extracted pages with the processor for the file extension.
+    Returns the chunks and the token count of the cleaned text.
+    """
+    if file_ext == ".pdf":
+        return pdf_process_to_chunks(pages, file_hash)
+    if file_ext == ".pptx":
+        return pptx_process_to_chunks(pages, file_hash)
+    raise ValueError(f"Unsupported file extension: {file_ext}")
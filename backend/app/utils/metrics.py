@@ -0,0 +1,24 @@
+import threading
+from collections import Counter
+
+# Process-wide counters, e.g. how often an upload hits the dedup fast path.
+# Exposed through GET /api/v1/metrics.
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> dict[str, float]:
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def ratio(numerator: str, denominator: str) -> float:
+    """Returns counters[numerator] / counters[denominator] (0.0 when empty)."""
+    with _lock:
+        total = _counters[denominator]
+        return _counters[numerator] / total if total else 0.0
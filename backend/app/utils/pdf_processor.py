@@ -1,38 +1,101 @@
+import os
 import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import fitz
-from langchain_text_splitters import TokenTextSplitter
-import tiktoken
+import xxhash
 
+from app.utils.boilerplate import strip_boilerplate
+from app.utils.token_chunker import chunk_pages
 
-def pdf_process_to_chunks(
-    file_bytes: bytes, file_hash: str, chunk_size: int = 512, chunk_overlap: int = 64
-) -> list[dict]:
+# Documents with at least this many pages are extracted by a pool of worker
+# processes, each handling a contiguous page range.
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "300"))
+PDF_EXTRACT_WORKERS = int(
+    os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn rather than fork: the API process runs threads (uvicorn, thread pools)
+        _executor = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    """Worker: opens the document itself and extracts pages [start, stop)."""
+    with fitz.open(file_path) as doc:
+        return [doc.load_page(i).get_text("text") for i in range(start, stop)]
+
+
+def _page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    size = -(-page_count // parts)  # ceil
+    return [(i, min(i + size, page_count)) for i in range(0, page_count, size)]
+
+
+def pdf_extract_pages(
+    file_bytes: bytes | memoryview,
+    file_path: str | None = None,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    Extracts the raw text of every page in a single pass.
+    The result feeds both upload validation and chunking.
 
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    When the document is on disk (`file_path`) and has at least
+    PDF_PARALLEL_PAGE_THRESHOLD pages, page ranges are extracted in parallel
+    worker processes and merged back in page order, so chunking (and its
+    document-wide dedup) sees exactly the same input as the serial path.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
 
-    splitter = TokenTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        encoding_name="cl100k_base",
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        page_count = len(doc)
+        if file_path is None or workers <= 1 or page_count < PDF_PARALLEL_PAGE_THRESHOLD:
+            return [page.get_text("text") for page in doc]
+
+    # a few slices per worker evens out pages of very different density
+    ranges = _page_ranges(page_count, workers * 2)
+    executor = _get_executor()
+    futures = [
+        executor.submit(_extract_page_range, file_path, start, stop)
+        for start, stop in ranges
+    ]
+
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def pdf_clean_pages(pages: list[str]) -> list[tuple[int, str]]:
+    """
+    Strips boilerplate lines (headers, footers, page numbers), drops lines
+    already seen elsewhere in the document and collapses whitespace, per page.
+    """
+    # split pages into lines/paragraphs
+    page_lines = strip_boilerplate(
+        [[line for line in raw_text.split("\n") if line] for raw_text in pages]
     )
 
-    final_chunks = []
+    cleaned_pages = []
     # this set will track content across the WHOLE document
+    # (as 64-bit hashes rather than the line strings themselves)
     global_seen_content = set()
 
-    for page_num, page in enumerate(doc):
-        raw_text = page.get_text("text")
-
-        # split page into lines/paragraphs
-        lines = raw_text.split("\n")
+    for page_num, lines in enumerate(page_lines):
         unique_page_lines = []
 
         for line in lines:
-            if not line:
-                continue
-
             # create a 'fingerprint' by removing all spaces
-            fingerprint = re.sub(r"\s+", "", line).lower()
+            fingerprint = xxhash.xxh64_intdigest(re.sub(r"\s+", "", line).lower())
 
             # global Filter
             if fingerprint not in global_seen_content:
@@ -43,17 +106,16 @@ def pdf_process_to_chunks(
 
         # one last pass to ensure no weird unicode characters remain
         clean_text = re.sub(r"\s+", " ", clean_text).strip()
+        cleaned_pages.append((page_num + 1, clean_text))
+
+    return cleaned_pages
 
-        # split and store
-        chunks = splitter.split_text(clean_text)
-        for chunk in chunks:
-            final_chunks.append(
-                {
-                    "text": chunk,
-                    "file_hash": file_hash,
-                    "page_number": page_num + 1,
-                }
-            )
-
-    doc.close()
-    return final_chunks
+
+def pdf_process_to_chunks(
+    pages: list[str], file_hash: str, chunk_size: int = 512, chunk_overlap: int = 64
+) -> tuple[list[dict], int]:
+    """
+    Cleans the extracted pages and splits them into token chunks.
+    Returns the chunks and the document's token count.
+    """
+    return chunk_pages(pdf_clean_pages(pages), file_hash, chunk_size, chunk_overlap)
@@ -1,54 +1,137 @@
 import re
 import io
-from pptx import Presentation
-from langchain_text_splitters import TokenTextSplitter
-import tiktoken
+import posixpath
+import zipfile
+from lxml import etree
 
-def pptx_process_to_chunks(
-    file_bytes: bytes, file_hash: str, chunk_size: int = 512, chunk_overlap: int = 64
-) -> list[dict]:
+from app.utils.boilerplate import strip_boilerplate
+from app.utils.token_chunker import chunk_pages
+from app.utils.upload_spool import MemoryViewReader
+
+_NS = {
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_P_SP = f"{{{_NS['p']}}}sp"
+_P_SPTREE = f"{{{_NS['p']}}}spTree"
+_P_TXBODY = f"{{{_NS['p']}}}txBody"
+_A_P = f"{{{_NS['a']}}}p"
+_A_R = f"{{{_NS['a']}}}r"
+_A_FLD = f"{{{_NS['a']}}}fld"
+_A_BR = f"{{{_NS['a']}}}br"
+_A_T = f"{{{_NS['a']}}}t"
+
+
+def _slide_part_names(package: zipfile.ZipFile) -> list[str]:
+    """Slide part names in presentation order (p:sldIdLst), like python-pptx's prs.slides."""
+    rels = etree.fromstring(package.read("ppt/_rels/presentation.xml.rels"))
+    targets = {
+        rel.get("Id"): posixpath.normpath(posixpath.join("ppt", rel.get("Target")))
+        for rel in rels.iterfind("rel:Relationship", _NS)
+    }
+    presentation = etree.fromstring(package.read("ppt/presentation.xml"))
+    return [
+        targets[sld_id.get(f"{{{_NS['r']}}}id")]
+        for sld_id in presentation.iterfind("p:sldIdLst/p:sldId", _NS)
+    ]
+
+
+def _paragraph_text(paragraph) -> str:
+    # runs and fields contribute their a:t text, line breaks a vertical tab
+    parts = []
+    for child in paragraph:
+        if child.tag in (_A_R, _A_FLD):
+            t = child.find(_A_T)
+            parts.append((t.text or "") if t is not None else "")
+        elif child.tag == _A_BR:
+            parts.append("\v")
+    return "".join(parts)
+
+
+def _slide_text(slide_xml) -> str:
     """
-    Extracts text from PPTX slides and splits into chunks.
-    Each chunk is mapped to a slide number.
+    Streams one slide part with iterparse. Collects the text of top-level
+    shapes (p:sp directly under p:spTree, i.e. what python-pptx exposes as
+    shape.text) and clears each shape element once it has been read.
     """
-    prs = Presentation(io.BytesIO(file_bytes))
+    shape_texts = []
+    paragraphs = []
+    path = []
 
-    splitter = TokenTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        encoding_name="cl100k_base",
-    )
+    for event, elem in etree.iterparse(
+        slide_xml, events=("start", "end"), resolve_entities=False
+    ):
+        if event == "start":
+            path.append(elem.tag)
+            continue
 
-    final_chunks = []
+        path.pop()
+        if elem.tag == _A_P and path[-3:] == [_P_SPTREE, _P_SP, _P_TXBODY]:
+            paragraphs.append(_paragraph_text(elem))
+        elif len(path) >= 1 and path[-1] == _P_SPTREE:
+            # a top-level shape (or picture, group, table ...) is complete
+            if elem.tag == _P_SP:
+                text = "\n".join(paragraphs).strip()
+                if text:
+                    shape_texts.append(text)
+            paragraphs = []
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
 
-    for i, slide in enumerate(prs.slides):
-        slide_num = i + 1
-        slide_text_elements = []
+    return "\n".join(shape_texts)
 
-        for shape in slide.shapes:
-            if hasattr(shape, "text") and shape.text.strip():
-                text = shape.text.strip()
-                slide_text_elements.append(text)
 
-        if not slide_text_elements:
-            continue
+def pptx_extract_slides(file_bytes: bytes | memoryview) -> list[str]:
+    """
+    Extracts the text of every slide in a single pass (one entry per slide,
+    empty string for slides without text) so slide numbers stay aligned.
+    A memoryview (e.g. over a memory-mapped upload) is read without copying.
 
-        clean_text = " ".join(slide_text_elements)
-        clean_text = re.sub(r"\s+", " ", clean_text).strip()
+    Slide XML parts are streamed straight out of the zip in presentation
+    order, without building python-pptx's object model or touching media
+    parts, so time and memory depend on the amount of text only.
+    """
+    if isinstance(file_bytes, memoryview):
+        source = io.BufferedReader(MemoryViewReader(file_bytes))
+    else:
+        source = io.BytesIO(file_bytes)
+
+    slides = []
+    with zipfile.ZipFile(source) as package:
+        for part_name in _slide_part_names(package):
+            with package.open(part_name) as slide_xml:
+                # one line per shape, so template text can be detected line by line
+                slides.append(_slide_text(slide_xml))
+
+    return slides
+
+
+def pptx_process_to_chunks(
+    slides: list[str], file_hash: str, chunk_size: int = 512, chunk_overlap: int = 64
+) -> tuple[list[dict], int]:
+    """
+    Splits extracted slide text into chunks.
+    Each chunk is mapped to a slide number.
+    Returns the chunks and the presentation's token count.
+    """
+    cleaned_slides = []
+    # drop template text repeated across slides (footers, slide numbers)
+    slide_lines = strip_boilerplate(
+        [[line for line in slide_text.splitlines() if line.strip()] for slide_text in slides]
+    )
+
+    for i, lines in enumerate(slide_lines):
+        slide_num = i + 1
+
+        clean_text = re.sub(r"\s+", " ", " ".join(lines)).strip()
 
         if not clean_text:
             continue
 
-        # Split and store
-        chunks = splitter.split_text(clean_text)
-        for chunk in chunks:
-            final_chunks.append(
-                {
-                    "text": chunk,
-                    "file_hash": file_hash,
-                    "page_number": slide_num, # Using page_number to maintain compatibility with DB schema
-                }
-            )
-
-    return final_chunks
+        # Using page_number to maintain compatibility with DB schema
+        cleaned_slides.append((slide_num, clean_text))
 
+    return chunk_pages(cleaned_slides, file_hash, chunk_size, chunk_overlap)
@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Request priorities: lower value is served first
+PRIORITY_INTERACTIVE = 0  # query embeddings for assessments, grading
+PRIORITY_BULK = 1  # ingestion batches
+
+
+class RateGovernor:
+    """
+    Process-wide admission control for calls to a rate-limited API.
+
+    Two limits apply to every call:
+    - a concurrency limit (calls in flight), adapted with AIMD: +1/limit after
+      each fast success, x0.5 on a 429 and x0.8 when latency exceeds the target;
+    - a token bucket on request volume (estimated tokens per second), scaled
+      down and back up together with the concurrency limit.
+
+    Waiting callers are served by priority, then FIFO. Bulk callers may not
+    take the last `reserved_interactive` slots and wait for bucket tokens;
+    interactive callers only wait for a free slot and may overdraw the bucket,
+    so query embeddings stay fast while ingestion absorbs the slowdown.
+    A 429 additionally pauses all dispatching for `throttle_pause` seconds,
+    instead of every caller sleeping on its own.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        initial_concurrency: int = 4,
+        tokens_per_second: float = 50_000,
+        latency_target: float = 10.0,
+        throttle_pause: float = 2.0,
+        reserved_interactive: int = 1,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.max_rate = tokens_per_second
+        self.rate = tokens_per_second
+        self.capacity = tokens_per_second * 2  # up to 2s worth of burst
+        self.bucket = self.capacity
+        self.latency_target = latency_target
+        self.throttle_pause = throttle_pause
+        self.reserved_interactive = reserved_interactive
+
+        self.in_flight = 0
+        self.throttled = 0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_BULK):
+        """Waits for a slot (and, for bulk calls, for bucket tokens)."""
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, granted))
+        self._dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # the slot was granted just as we were cancelled: hand it back
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+
+    def release(self, latency: float, throttled: bool = False):
+        """Returns a slot and adapts the limits to how the call went."""
+        self.in_flight -= 1
+        now = time.monotonic()
+
+        if throttled:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, now + self.throttle_pause)
+            self._decrease(0.5, now)
+        elif latency > self.latency_target:
+            self._decrease(0.8, now)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05 / self.limit)
+
+        self._dispatch()
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "tokens_per_second": round(self.rate),
+            "waiting": sum(1 for *_, f in self._waiters if not f.done()),
+            "throttled": self.throttled,
+            "paused": self._paused_until > time.monotonic(),
+        }
+
+    def _decrease(self, factor: float, now: float):
+        # one decrease per latency window: responses to calls sent before the
+        # last decrease carry no new information
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit * factor)
+        self.rate = max(self.max_rate * 0.05, self.rate * factor)
+
+    def _refill(self, now: float):
+        self.bucket = min(
+            self.capacity, self.bucket + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+
+    def _dispatch(self):
+        now = time.monotonic()
+        self._refill(now)
+
+        if now < self._paused_until:
+            self._wake_at(self._paused_until - now)
+            return
+
+        while self._waiters:
+            priority, _, tokens, granted = self._waiters[0]
+            if granted.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+
+            slots = int(self.limit)
+            if priority != PRIORITY_INTERACTIVE:
+                slots = max(1, slots - self.reserved_interactive)
+            if self.in_flight >= slots:
+                return  # woken again by release()
+
+            needed = min(tokens, self.capacity)
+            if priority != PRIORITY_INTERACTIVE and self.bucket < needed:
+                self._wake_at((needed - self.bucket) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            self.bucket -= tokens
+            granted.set_result(None)
+
+    def _wake_at(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
@@ -0,0 +1,78 @@
+import os
+from functools import lru_cache
+
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+# threads used by tiktoken to encode pages (it releases the GIL)
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", str(min(8, os.cpu_count() or 1))))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = ENCODING_NAME) -> tiktoken.Encoding:
+    """Process-wide tokenizer, loaded once."""
+    return tiktoken.get_encoding(name)
+
+
+def split_tokens(
+    tokens: list[int], encoding: tiktoken.Encoding, chunk_size: int, chunk_overlap: int
+) -> list[tuple[str, int]]:
+    """
+    Slices one page's tokens into overlapping windows and decodes them,
+    returning (text, token count) per chunk.
+    Mirrors langchain's TokenTextSplitter window-by-window, so chunk
+    boundaries (and therefore chunk ids and stored vectors) are unchanged.
+    """
+    if chunk_size <= chunk_overlap:
+        raise ValueError("chunk_size must be greater than chunk_overlap")
+
+    chunks = []
+    step = chunk_size - chunk_overlap
+    start = 0
+    while start < len(tokens):
+        stop = min(start + chunk_size, len(tokens))
+        text = encoding.decode(tokens[start:stop])
+        if text:
+            chunks.append((text, stop - start))
+        if stop == len(tokens):
+            break
+        start += step
+    return chunks
+
+
+def chunk_pages(
+    pages: list[tuple[int, str]],
+    file_hash: str,
+    chunk_size: int = 512,
+    chunk_overlap: int = 64,
+) -> tuple[list[dict], int]:
+    """
+    Chunks cleaned page texts given as (page_number, text) pairs.
+    Every page is encoded exactly once (pages are encoded in a thread pool)
+    and the same tokens are used for splitting and for counting.
+    Returns the chunks and the total token count of the pages.
+    """
+    encoding = get_encoding()
+    # same special-token handling as TokenTextSplitter's defaults
+    encoded = encoding.encode_batch(
+        [text for _, text in pages],
+        num_threads=TOKENIZER_THREADS,
+        allowed_special=set(),
+        disallowed_special="all",
+    )
+
+    final_chunks = []
+    token_count = 0
+    for (page_number, _), tokens in zip(pages, encoded):
+        token_count += len(tokens)
+        for chunk, chunk_tokens in split_tokens(tokens, encoding, chunk_size, chunk_overlap):
+            final_chunks.append(
+                {
+                    "text": chunk,
+                    "file_hash": file_hash,
+                    "page_number": page_number,
+                    "token_count": chunk_tokens,
+                }
+            )
+
+    return final_chunks, token_count
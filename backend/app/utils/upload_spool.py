@@ -0,0 +1,118 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from fastapi import UploadFile
+
+# Size of each read from the request body while spooling to disk
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as a streamed upload crosses the size limit."""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes (read {size} so far)")
+        self.size = size
+        self.limit = limit
+
+
+class SpooledUpload:
+    """
+    An upload streamed to a temporary file on disk, along with the
+    SHA-256 and size computed while it was being written.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @contextmanager
+    def mapped(self):
+        """Yields a read-only memoryview over a memory map of the spooled file."""
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    yield view
+
+    def open(self) -> io.BufferedReader:
+        """Opens the spooled file for streaming (e.g. to Storage)."""
+        return open(self.path, "rb")
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable, read-only file object over a memoryview, without copying it."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        data = self._view[self._pos : self._pos + len(buffer)]
+        n = len(data)
+        buffer[:n] = data
+        self._pos += n
+        return n
+
+
+async def spool_upload(
+    file: UploadFile, max_size: int, block_size: int = UPLOAD_BLOCK_SIZE
+) -> SpooledUpload:
+    """
+    Streams an UploadFile to a temporary file in fixed-size blocks, hashing
+    incrementally. Raises UploadTooLarge as soon as max_size is crossed, so
+    peak memory per upload stays at roughly one block regardless of file size.
+
+    The UploadFile is already fully received: Starlette's multipart parser
+    buffers each file (to disk past 1 MB) before the endpoint runs, and this
+    copies it once more, to a named file that parallel PDF extraction can
+    open by path. How much a request may send is capped before parsing by
+    RequestBodyLimitMiddleware; max_size here is the per-file limit.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    tmp = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+    try:
+        with tmp:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_size:
+                    raise UploadTooLarge(size, max_size)
+                hasher.update(block)
+                tmp.write(block)
+    except BaseException:
+        os.remove(tmp.name)
+        raise
+
+    return SpooledUpload(tmp.name, size, hasher.hexdigest())
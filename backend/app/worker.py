@@ -0,0 +1,196 @@
+"""
+Ingestion worker: leases jobs from the `ingestion_jobs` queue and runs
+process_document for them, independently of the API process.
+
+Run with:
+    python -m app.worker
+"""
+import asyncio
+import os
+import socket
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from supabase import Client, create_client
+
+from app.services.embedding_service import EMBEDDING_MODEL, EmbeddingService
+from app.services.embedding_store import EMBEDDING_STORE_ENABLED, EmbeddingStore
+from app.services.job_queue_service import (
+    INGESTION_JOB_LEASE_SECONDS,
+    JobQueueService,
+    LeaseLostError,
+)
+from app.services.vector_db_service import VectorDBService
+from app.tasks import process_document
+
+load_dotenv()
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+WORKER_POLL_INTERVAL_SECONDS = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "2"))
+
+
+class IngestionWorker:
+    def __init__(
+        self,
+        db_client: Client,
+        job_queue: JobQueueService,
+        vector_service: VectorDBService,
+        embedding_service: EmbeddingService,
+    ):
+        self.db = db_client
+        self.job_queue = job_queue
+        self.vector_service = vector_service
+        self.embedding_service = embedding_service
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+
+    async def run(self, concurrency: int = WORKER_CONCURRENCY):
+        print(f"Ingestion worker {self.worker_id} started ({concurrency} slot(s))")
+        await asyncio.gather(*(self._slot() for _ in range(concurrency)))
+
+    async def _slot(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.job_queue.claim, self.worker_id)
+            except Exception as e:
+                print(f"Worker {self.worker_id} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                await asyncio.sleep(WORKER_POLL_INTERVAL_SECONDS)
+                continue
+
+            await self._run_job(job)
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Task) -> bool:
+        """
+        Renews the lease until cancelled. If the lease was lost (it expired
+        and another worker claimed the job) stops `work` and returns True.
+        """
+        # renew well before the lease runs out
+        while True:
+            await asyncio.sleep(INGESTION_JOB_LEASE_SECONDS / 3)
+            try:
+                renewed = await asyncio.to_thread(
+                    self.job_queue.renew_lease, job_id, self.worker_id
+                )
+            except Exception as e:
+                print(f"Lease renewal failed for job {job_id}: {e}")
+                continue
+            if not renewed:
+                work.cancel()
+                return True
+
+    async def _run_job(self, job: dict):
+        job_id = job["id"]
+        document_id = job["document_id"]
+
+        # a job recovered from an expired lease may already be out of attempts
+        if job["attempts"] > job["max_attempts"]:
+            try:
+                await asyncio.to_thread(
+                    self.job_queue.fail, job, "Lease expired after the final attempt", self.worker_id
+                )
+            except LeaseLostError as e:
+                print(e)
+                return
+            await asyncio.to_thread(self._set_document_status, document_id, "failed")
+            return
+
+        document = await asyncio.to_thread(self._get_document, document_id)
+        if document is None:
+            try:
+                # document was deleted meanwhile
+                await asyncio.to_thread(self.job_queue.complete, job_id, self.worker_id)
+            except LeaseLostError as e:
+                print(e)
+            return
+
+        print(
+            f"Worker {self.worker_id} running job {job_id} for doc {document_id} "
+            f"(attempt {job['attempts']}/{job['max_attempts']})"
+        )
+
+        work = asyncio.create_task(
+            process_document(
+                document_id=document_id,
+                file_hash=document["file_hash"],
+                file_path=document["file_path"],
+                db_client=self.db,
+                vector_service=self.vector_service,
+                embedding_service=self.embedding_service,
+                raise_errors=True,
+            )
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, work))
+        try:
+            await work
+            await asyncio.to_thread(self.job_queue.complete, job_id, self.worker_id)
+        except asyncio.CancelledError:
+            if not (heartbeat.done() and not heartbeat.cancelled() and heartbeat.result()):
+                raise  # the worker itself is shutting down
+            print(f"Lost the lease on job {job_id}; stopped processing doc {document_id}")
+        except LeaseLostError as e:
+            # the lease lapsed between the last renewal and finishing; the new
+            # owner's state stands
+            print(e)
+        except Exception as e:
+            try:
+                will_retry = await asyncio.to_thread(
+                    self.job_queue.fail, job, str(e), self.worker_id
+                )
+            except LeaseLostError as lost:
+                print(f"Job {job_id} failed: {e} ({lost})")
+                return
+            if will_retry:
+                # back to 'pending' so it isn't treated as a recoverable failure
+                await asyncio.to_thread(self._set_document_status, document_id, "pending")
+            print(
+                f"Job {job_id} failed: {e} ({'will retry' if will_retry else 'giving up'})"
+            )
+        finally:
+            heartbeat.cancel()
+            if not work.done():
+                work.cancel()
+
+    # blocking supabase calls: run them with asyncio.to_thread, so a slow round
+    # trip does not stall the other slots or their lease heartbeats
+    def _get_document(self, document_id: str) -> dict | None:
+        doc_res = (
+            self.db.table("documents")
+            .select("id, file_hash, file_path")
+            .eq("id", document_id)
+            .maybe_single()
+            .execute()
+        )
+        return doc_res.data if doc_res else None
+
+    def _set_document_status(self, document_id: str, status: str):
+        self.db.table("documents").update({"status": status}).eq(
+            "id", document_id
+        ).execute()
+
+
+async def main():
+    supabase_service_client = create_client(
+        os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY")
+    )
+    vector_service = VectorDBService(db_url=os.getenv("DATABASE_URL"))
+    embedding_store = (
+        EmbeddingStore(vector_service.client, model=EMBEDDING_MODEL)
+        if EMBEDDING_STORE_ENABLED
+        else None
+    )
+    worker = IngestionWorker(
+        db_client=supabase_service_client,
+        job_queue=JobQueueService(supabase_service_client),
+        vector_service=vector_service,
+        embedding_service=EmbeddingService(store=embedding_store),
+    )
+    try:
+        await worker.run()
+    finally:
+        await vector_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Benchmark: retrieval latency as the corpus grows, per chunk table layout.
+
+Builds a scratch chunk table in each layout:
+  - metadata:    the original vecs table, document_id only inside JSONB
+  - columns:     typed document_id / file_hash / page_number / chunk_index
+  - partitioned: typed columns, hash-partitioned by document_id
+loads --docs synthetic documents, then grows the corpus --growth times.
+At both sizes it runs queries filtered to the same --selected documents
+(like get_context_for_assessment) and reports p50/p99 latency and how many
+of the requested k chunks came back.
+
+Usage (from backend/):
+    python -m scripts.bench_chunk_layout [--docs 200] [--growth 10]
+        [--chunks-per-doc 50] [--selected 5] [--queries 100] [--partitions 16]
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+import numpy as np
+import vecs
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app.services.vector_db_service import VectorDBService
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION
+from scripts.migrate_chunk_columns import add_columns, partition_table
+
+load_dotenv()
+
+TABLE = "bench_chunk_layout"
+LAYOUTS = ["metadata", "columns", "partitioned"]
+
+
+def drop_tables(client: vecs.Client):
+    with client.Session() as sess:
+        with sess.begin():
+            for name in (TABLE, f"{TABLE}_partitioned", f"{TABLE}_unpartitioned"):
+                sess.execute(text(f'drop table if exists vecs."{name}" cascade'))
+
+
+def create_layout(client: vecs.Client, layout: str, dimension: int, partitions: int):
+    drop_tables(client)
+    client.get_or_create_collection(name=TABLE, dimension=dimension)
+    if layout in ("columns", "partitioned"):
+        add_columns(client, TABLE)
+    if layout == "partitioned":
+        partition_table(client, TABLE, dimension, partitions, batch=5000)
+        with client.Session() as sess:
+            with sess.begin():
+                sess.execute(text(f'drop table vecs."{TABLE}_unpartitioned"'))
+
+
+def document_vectors(rng: np.random.Generator, n: int, dimension: int) -> tuple[np.ndarray, np.ndarray]:
+    # one topic per document; its chunks are noisy copies of it
+    center = rng.standard_normal(dimension).astype(np.float32)
+    vectors = center + 0.8 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return center, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def load_documents(
+    service: VectorDBService, rng: np.random.Generator, n_docs: int, chunks_per_doc: int
+) -> dict[str, np.ndarray]:
+    centers = {}
+    for _ in range(n_docs):
+        document_id = str(uuid.uuid4())
+        center, vectors = document_vectors(rng, chunks_per_doc, service.dimension)
+        chunks = [{"text": f"chunk {i}", "page_number": i // 5 + 1} for i in range(chunks_per_doc)]
+        await service.upsert_chunks(
+            chunks, vectors.tolist(), file_hash=document_id.replace("-", ""), document_id=document_id
+        )
+        centers[document_id] = center
+    return centers
+
+
+async def measure(service: VectorDBService, queries, selected: list[str], k: int):
+    filters = {"$and": [{"document_id": {"$in": selected}}]}
+    timings, returned = [], []
+    for query in queries:
+        started = time.perf_counter()
+        ids = await service.query(query, k, filters, include_metadata=False)
+        timings.append((time.perf_counter() - started) * 1000)
+        returned.append(len(ids))
+    return np.percentile(timings, 50), np.percentile(timings, 99), np.mean(returned) / k
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--growth", type=int, default=10)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--selected", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--partitions", type=int, default=16)
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    client = vecs.create_client(db_url)
+
+    print(f"{'layout':>12} {'docs':>7} {'chunks':>9} {'p50 ms':>8} {'p99 ms':>8} {'hits/k':>7}")
+    for layout in LAYOUTS:
+        rng = np.random.default_rng(0)
+        create_layout(client, layout, EMBEDDING_DIMENSION, args.partitions)
+        service = VectorDBService(db_url, collection_name=TABLE)
+
+        centers = await load_documents(service, rng, args.docs, args.chunks_per_doc)
+        service.ensure_indexes(create=True)
+        selected = list(centers)[: args.selected]
+        queries = [
+            (centers[rng.choice(selected)] + rng.standard_normal(EMBEDDING_DIMENSION)).tolist()
+            for _ in range(args.queries)
+        ]
+
+        p50s = []
+        for n_docs in (args.docs, args.docs * args.growth):
+            if n_docs > len(centers):
+                centers.update(
+                    await load_documents(service, rng, n_docs - len(centers), args.chunks_per_doc)
+                )
+            with client.Session() as sess:
+                with sess.begin():
+                    sess.execute(text(f'analyze vecs."{TABLE}"'))
+
+            await measure(service, queries[:10], selected, args.k)  # warm up
+            p50, p99, hits = await measure(service, queries, selected, args.k)
+            p50s.append(p50)
+            print(
+                f"{layout:>12} {n_docs:>7} {n_docs * args.chunks_per_doc:>9} "
+                f"{p50:>8.1f} {p99:>8.1f} {hits:>7.2f}"
+            )
+        print(f"{layout:>12} p50 growth at {args.growth}x documents: {p50s[1] / p50s[0]:.2f}x")
+        await service.close()
+
+    drop_tables(client)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
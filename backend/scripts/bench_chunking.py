@@ -0,0 +1,69 @@
+"""
+Benchmark: upload-time tokenization and chunking of large PDFs.
+
+Compares the previous path (encode the whole document once to count tokens,
+then let a TokenTextSplitter re-encode every cleaned page) with the
+single-pass chunker in app.utils.token_chunker, and checks that both produce
+the same chunks.
+
+Usage (from backend/):
+    python -m scripts.bench_chunking [--pages 100 500 2000]
+"""
+import argparse
+import os
+import tempfile
+
+import tiktoken
+from langchain_text_splitters import TokenTextSplitter
+
+from app.utils.pdf_processor import (
+    pdf_clean_pages,
+    pdf_extract_pages,
+    pdf_process_to_chunks,
+)
+from scripts.bench_pdf_extraction import build_pdf, timed
+
+
+def legacy_chunks(pages: list[str], file_hash: str) -> tuple[list[dict], int]:
+    encoding = tiktoken.get_encoding("cl100k_base")
+    token_count = len(encoding.encode("\n".join(pages)))
+
+    splitter = TokenTextSplitter(
+        chunk_size=512, chunk_overlap=64, encoding_name="cl100k_base"
+    )
+    chunks = [
+        {"text": text, "file_hash": file_hash, "page_number": page_number}
+        for page_number, clean_text in pdf_clean_pages(pages)
+        for text in splitter.split_text(clean_text)
+    ]
+    return chunks, token_count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'chunks':>7} {'legacy (s)':>11} {'single-pass (s)':>16} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            build_pdf(path, pages)
+            with open(path, "rb") as f:
+                text_pages = pdf_extract_pages(f.read())
+
+            expected, _ = legacy_chunks(text_pages, "bench")
+            chunks, _ = pdf_process_to_chunks(text_pages, "bench")
+            assert [(c["text"], c["page_number"]) for c in chunks] == [
+                (c["text"], c["page_number"]) for c in expected
+            ]
+
+            legacy = timed(lambda: legacy_chunks(text_pages, "bench"))
+            single = timed(lambda: pdf_process_to_chunks(text_pages, "bench"))
+            print(
+                f"{pages:>6} {len(chunks):>7} {legacy:>11.3f} {single:>16.3f} {legacy / single:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: time-to-context for multi-topic assessments.
+
+Loads --docs synthetic documents into a scratch chunk table, then for 1, 2,
+4, ... --max-topics topics compares
+  - per-topic: one VectorDBService.query per topic (gathered), as
+    generate_assessment used to do,
+  - batched:   one VectorDBService.query_many for all topics (LATERAL join),
+and reports the median wall time per assessment. Only the vector search is
+timed; the embedding side goes from one Nomic request per topic to one.
+
+Usage (from backend/):
+    python -m scripts.bench_multi_topic_retrieval [--docs 50] [--chunks-per-doc 50]
+        [--selected 3] [--max-topics 8] [--k 10] [--repeats 30]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+import vecs
+from dotenv import load_dotenv
+
+from app.services.vector_db_service import VectorDBService
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION
+from scripts.bench_chunk_layout import TABLE, create_layout, drop_tables, load_documents
+
+load_dotenv()
+
+
+async def per_topic(service: VectorDBService, queries, filters, k: int):
+    return await asyncio.gather(*(service.query(q, k, filters) for q in queries))
+
+
+async def batched(service: VectorDBService, queries, filters, k: int):
+    return await service.query_many(queries, k, filters)
+
+
+async def median_ms(search, service, queries, filters, k: int, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await search(service, queries, filters, k)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--selected", type=int, default=3)
+    parser.add_argument("--max-topics", type=int, default=8)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--layout", default="columns", choices=["metadata", "columns", "partitioned"])
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    client = vecs.create_client(db_url)
+    rng = np.random.default_rng(0)
+
+    create_layout(client, args.layout, EMBEDDING_DIMENSION, partitions=16)
+    service = VectorDBService(db_url, collection_name=TABLE)
+    centers = await load_documents(service, rng, args.docs, args.chunks_per_doc)
+    service.ensure_indexes(create=True)
+    await service.open()
+
+    selected = list(centers)[: args.selected]
+    filters = {"$and": [{"document_id": {"$in": selected}}]}
+
+    print(f"{'topics':>7} {'per-topic ms':>13} {'batched ms':>11} {'same hits':>10}")
+    n_topics = 1
+    while n_topics <= args.max_topics:
+        queries = [
+            (centers[rng.choice(selected)] + rng.standard_normal(EMBEDDING_DIMENSION)).tolist()
+            for _ in range(n_topics)
+        ]
+        # warm up, and check both paths return the same chunks
+        separate = await per_topic(service, queries, filters, args.k)
+        together = await batched(service, queries, filters, args.k)
+        same = [[row[0] for row in hits] for hits in separate] == [
+            [row[0] for row in hits] for hits in together
+        ]
+
+        separate_ms = await median_ms(per_topic, service, queries, filters, args.k, args.repeats)
+        together_ms = await median_ms(batched, service, queries, filters, args.k, args.repeats)
+        print(f"{n_topics:>7} {separate_ms:>13.1f} {together_ms:>11.1f} {str(same):>10}")
+        n_topics *= 2
+
+    await service.close()
+    drop_tables(client)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Benchmark: single-process vs page-parallel PDF text extraction.
+
+Builds synthetic 100/500/2,000-page PDFs and times pdf_extract_pages with
+one worker and with N worker processes.
+
+Usage (from backend/):
+    python -m scripts.bench_pdf_extraction [--workers 4] [--pages 100 500 2000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import fitz
+
+from app.utils import pdf_processor
+from app.utils.pdf_processor import pdf_extract_pages
+
+WORDS = (
+    "recursion stack heap pointer graph tree node edge vertex sort merge quick "
+    "binary search hash table complexity amortized dynamic programming greedy"
+).split()
+
+
+def build_pdf(path: str, pages: int, lines_per_page: int = 45):
+    rng = random.Random(pages)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        body = "\n".join(
+            " ".join(rng.choice(WORDS) for _ in range(12))
+            for _ in range(lines_per_page)
+        )
+        page.insert_textbox(fitz.Rect(36, 36, 576, 756), body, fontsize=9)
+        page.insert_text((36, 780), f"Page {page_num + 1} of {pages}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    # benchmark the parallel path regardless of the configured threshold
+    pdf_processor.PDF_PARALLEL_PAGE_THRESHOLD = 1
+    pdf_processor.PDF_EXTRACT_WORKERS = args.workers
+
+    print(f"{'pages':>6} {'1 proc (s)':>11} {f'{args.workers} procs (s)':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            build_pdf(path, pages)
+            with open(path, "rb") as f:
+                data = f.read()
+
+            serial = timed(lambda: pdf_extract_pages(data))
+            # warm the pool so process start-up isn't counted
+            pdf_extract_pages(data, file_path=path, workers=args.workers)
+            parallel = timed(
+                lambda: pdf_extract_pages(data, file_path=path, workers=args.workers)
+            )
+
+            assert pdf_extract_pages(data) == pdf_extract_pages(
+                data, file_path=path, workers=args.workers
+            )
+            print(f"{pages:>6} {serial:>11.3f} {parallel:>12.3f} {serial / parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
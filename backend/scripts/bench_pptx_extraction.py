@@ -0,0 +1,114 @@
+"""
+Benchmark: streaming PPTX text extraction vs the python-pptx object model.
+
+Builds a synthetic deck (text placeholders, a group shape, a table and an
+embedded image on every slide), then measures wall time and peak Python
+memory (tracemalloc) for pptx_extract_slides and for the previous
+python-pptx based extraction, and checks that both return the same text.
+
+Usage (from backend/):
+    python -m scripts.bench_pptx_extraction [--slides 50 300]
+"""
+import argparse
+import io
+import random
+import time
+import tracemalloc
+
+import fitz
+import numpy as np
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.utils.pptx_processor import pptx_extract_slides
+
+WORDS = (
+    "recursion stack heap pointer graph tree node edge vertex sort merge quick "
+    "binary search hash table complexity amortized dynamic programming greedy"
+).split()
+
+
+def random_png(rng: np.random.Generator, size: int = 384) -> bytes:
+    samples = rng.integers(0, 256, size * size * 3, dtype=np.uint8).tobytes()
+    return fitz.Pixmap(fitz.csRGB, size, size, samples, False).tobytes("png")
+
+
+def build_deck(slides: int) -> bytes:
+    rng = random.Random(slides)
+    np_rng = np.random.default_rng(slides)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # title and content
+
+    for slide_num in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Lecture {slide_num // 20 + 1}: {rng.choice(WORDS)}"
+        body = slide.placeholders[1].text_frame
+        body.text = " ".join(rng.choice(WORDS) for _ in range(12))
+        for _ in range(4):
+            paragraph = body.add_paragraph()
+            paragraph.text = " ".join(rng.choice(WORDS) for _ in range(10))
+            paragraph.add_line_break()
+            paragraph.add_run().text = rng.choice(WORDS)
+
+        group = slide.shapes.add_group_shape()
+        group.shapes.add_textbox(Inches(1), Inches(6), Inches(2), Inches(1)).text = "grouped"
+        table = slide.shapes.add_table(2, 2, Inches(5), Inches(6), Inches(3), Inches(1)).table
+        table.cell(0, 0).text = "cell"
+        slide.shapes.add_picture(
+            io.BytesIO(random_png(np_rng)), Inches(7), Inches(1), Inches(2), Inches(2)
+        )
+        slide.shapes.add_textbox(Inches(0.5), Inches(7), Inches(3), Inches(0.4)).text = (
+            f"COSC 481 - Slide {slide_num + 1}"
+        )
+
+    out = io.BytesIO()
+    prs.save(out)
+    return out.getvalue()
+
+
+def python_pptx_extract_slides(file_bytes: bytes) -> list[str]:
+    """The previous extractor, built on the python-pptx object model."""
+    prs = Presentation(io.BytesIO(file_bytes))
+    slides = []
+    for slide in prs.slides:
+        slide_text_elements = []
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text.strip():
+                slide_text_elements.append(shape.text.strip())
+        slides.append("\n".join(slide_text_elements))
+    return slides
+
+
+def measure(fn, data: bytes) -> tuple[float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(data)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slides", type=int, nargs="+", default=[50, 300])
+    args = parser.parse_args()
+
+    print(
+        f"{'slides':>6} {'size (MB)':>10} {'python-pptx (s)':>16} {'peak (MB)':>10} "
+        f"{'streaming (s)':>14} {'peak (MB)':>10}"
+    )
+    for slides in args.slides:
+        data = build_deck(slides)
+        assert pptx_extract_slides(data) == python_pptx_extract_slides(data)
+
+        legacy_time, legacy_peak = measure(python_pptx_extract_slides, data)
+        stream_time, stream_peak = measure(pptx_extract_slides, data)
+        print(
+            f"{slides:>6} {len(data) / (1024 * 1024):>10.1f} {legacy_time:>16.3f} {legacy_peak:>10.1f} "
+            f"{stream_time:>14.3f} {stream_peak:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: float32 vs halfvec vs binary-quantized chunk search.
+
+Copies a sample of stored chunk vectors (or synthetic clustered vectors with
+--synthetic) into a scratch collection, builds the HNSW index of each
+storage format and reports index size, p50/p99 query latency and recall@k
+against exact float32 search. The quantized formats rerank their
+candidates against the full-precision vectors, exactly as
+VectorDBService.query does with VECTOR_STORAGE_FORMAT set.
+
+Usage (from backend/):
+    python -m scripts.bench_vector_storage [--rows 50000] [--queries 200] [--k 10]
+        [--synthetic] [--rerank-factor 4] [--keep]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+import vecs
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+
+from app.services.vector_db_service import _DEFAULT_RERANK_FACTOR, VectorDBService
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION, chunk_collection_name
+
+load_dotenv()
+
+COLLECTION = "bench_vector_storage"
+FORMATS = ["float32", "halfvec", "binary"]
+
+
+def sample_vectors(client: vecs.Client, n: int) -> np.ndarray:
+    collection = client.get_or_create_collection(
+        name=chunk_collection_name(EMBEDDING_DIMENSION), dimension=EMBEDDING_DIMENSION
+    )
+    table = collection.table
+    with client.Session() as sess:
+        rows = sess.execute(
+            select(table.c.vec).order_by(text("random()")).limit(n)
+        ).fetchall()
+    return np.asarray([list(row[0]) for row in rows], dtype=np.float32)
+
+
+def synthetic_vectors(n: int, dimension: int, clusters: int = 200) -> np.ndarray:
+    # clustered like real chunk embeddings (many near-duplicates per topic)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_collection(client: vecs.Client, vectors: np.ndarray, batch: int = 1000):
+    client.delete_collection(COLLECTION)
+    collection = client.get_or_create_collection(name=COLLECTION, dimension=vectors.shape[1])
+    for start in range(0, len(vectors), batch):
+        collection.upsert(
+            records=[
+                (str(i), vec.tolist(), {"document_id": "bench"})
+                for i, vec in enumerate(vectors[start:start + batch], start=start)
+            ]
+        )
+    return collection
+
+
+def index_size(client: vecs.Client, index_name: str) -> int:
+    with client.Session() as sess:
+        return sess.execute(
+            text("select pg_relation_size(:name)"), {"name": f'vecs."{index_name}"'}
+        ).scalar()
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set[str]]:
+    scores = queries @ vectors.T
+    return [set(str(i) for i in row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+async def run_queries(service: VectorDBService, queries: np.ndarray, k: int):
+    timings, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        ids = await service.query(
+            query.tolist(), k, {"document_id": {"$eq": "bench"}}, include_metadata=False
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        found.append(set(ids))
+    return timings, found
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--rerank-factor", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collection")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    client = vecs.create_client(db_url)
+
+    vectors = (
+        synthetic_vectors(args.rows, EMBEDDING_DIMENSION)
+        if args.synthetic
+        else sample_vectors(client, args.rows)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    dimension = vectors.shape[1]
+
+    started = time.perf_counter()
+    load_collection(client, vectors)
+    print(f"Loaded {len(vectors)} vectors ({dimension} dims) in {time.perf_counter() - started:.1f}s")
+
+    # queries: perturbed corpus vectors, so every query has real neighbours
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    expected = exact_top_k(vectors, queries, args.k)
+
+    print(
+        f"{'format':>8} {'rerank':>7} {'index MB':>9} {'build s':>8} "
+        f"{'p50 ms':>7} {'p99 ms':>7} {'recall@k':>9}"
+    )
+    for storage_format in FORMATS:
+        service = VectorDBService(
+            db_url,
+            dimension=dimension,
+            storage_format=storage_format,
+            rerank_factor=args.rerank_factor or _DEFAULT_RERANK_FACTOR[storage_format],
+            collection_name=COLLECTION,
+        )
+        started = time.perf_counter()
+        status = service.rebuild_indexes()
+        build_seconds = time.perf_counter() - started
+
+        await run_queries(service, queries[:10], args.k)  # warm the index into cache
+        timings, found = await run_queries(service, queries, args.k)
+        recall = sum(len(e & f) for e, f in zip(expected, found)) / (args.k * len(queries))
+
+        print(
+            f"{storage_format:>8} {service.rerank_factor:>7} "
+            f"{index_size(client, status['ann_index']) / 2**20:>9.1f} {build_seconds:>8.1f} "
+            f"{np.percentile(timings, 50):>7.1f} {np.percentile(timings, 99):>7.1f} {recall:>9.3f}"
+        )
+        await service.close()
+
+    if not args.keep:
+        client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
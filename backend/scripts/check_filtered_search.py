@@ -0,0 +1,129 @@
+"""
+Check: filtered searches return k results when the filter is selective.
+
+An HNSW scan applies the document filter after collecting its ef_search
+candidates, so for a user whose documents hold a small share of the chunks
+it can return fewer than k rows, or none. Loads synthetic clustered vectors
+spread over --documents documents into a scratch collection, then for each
+storage format searches the chunks of --user-documents of them (query and
+query_many) and checks every search returns k results, with recall@k
+against exact search. Runs each search twice: as configured (an exact scan
+below VECTOR_EXACT_SCAN_MAX_ROWS) and with the exact scan disabled, which
+exercises the HNSW path (iterative scan on pgvector 0.8+, a widened
+ef_search before that).
+
+Usage (from backend/):
+    python -m scripts.check_filtered_search [--rows 30000] [--documents 300]
+        [--user-documents 2] [--queries 50] [--k 10]
+        [--formats float32,halfvec,binary] [--keep]
+"""
+import argparse
+import asyncio
+import os
+
+import numpy as np
+import vecs
+from dotenv import load_dotenv
+
+from app.services import vector_db_service
+from app.services.vector_db_service import VectorDBService
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION
+
+load_dotenv()
+
+COLLECTION = "check_filtered_search"
+FORMATS = ["float32", "halfvec", "binary"]
+
+
+def synthetic_vectors(n: int, dimension: int, clusters: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def document_id(n: int) -> str:
+    return f"00000000-0000-0000-0000-{n:012d}"
+
+
+def load_collection(client: vecs.Client, vectors: np.ndarray, documents: int, batch: int = 1000):
+    client.delete_collection(COLLECTION)
+    collection = client.get_or_create_collection(name=COLLECTION, dimension=vectors.shape[1])
+    for start in range(0, len(vectors), batch):
+        collection.upsert(
+            records=[
+                (str(i), vec.tolist(), {"document_id": document_id(i % documents)})
+                for i, vec in enumerate(vectors[start:start + batch], start=start)
+            ]
+        )
+
+
+async def check(service: VectorDBService, queries, expected, user_documents, k) -> bool:
+    filters = {"document_id": {"$in": [document_id(n) for n in range(user_documents)]}}
+    single = [
+        await service.query(query.tolist(), k, filters, include_metadata=False)
+        for query in queries
+    ]
+    many = await service.query_many([q.tolist() for q in queries], k, filters, include_metadata=False)
+
+    ok = True
+    for name, found in (("query", single), ("query_many", many)):
+        short = sum(1 for ids in found if len(ids) < k)
+        recall = sum(len(e & set(f)) for e, f in zip(expected, found)) / (k * len(queries))
+        print(f"    {name:>10}: {short}/{len(queries)} searches short of {k}, recall@k {recall:.3f}")
+        ok &= short == 0
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--user-documents", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--formats", default=",".join(FORMATS), help="halfvec and binary need pgvector 0.7+")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collection")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    client = vecs.create_client(db_url)
+    vectors = synthetic_vectors(args.rows, EMBEDDING_DIMENSION)
+    load_collection(client, vectors, args.documents)
+
+    # the user's chunks, and queries near them (as a topic from their notes would be)
+    owned = np.flatnonzero(np.arange(args.rows) % args.documents < args.user_documents)
+    print(f"{len(owned)} of {args.rows} chunks ({len(owned) / args.rows:.1%}) belong to the user")
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(owned, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ vectors[owned].T
+    expected = [set(str(owned[i]) for i in row) for row in np.argsort(-scores, axis=1)[:, :args.k]]
+
+    ok = True
+    exact_max_rows = vector_db_service.VECTOR_EXACT_SCAN_MAX_ROWS
+    for storage_format in args.formats.split(","):
+        service = VectorDBService(
+            db_url,
+            dimension=EMBEDDING_DIMENSION,
+            storage_format=storage_format,
+            collection_name=COLLECTION,
+        )
+        service.rebuild_indexes()
+        print(f"{storage_format} (iterative scan: {service.iterative_scan})")
+        for label, max_rows in (("exact scan allowed", exact_max_rows), ("HNSW only", 0)):
+            vector_db_service.VECTOR_EXACT_SCAN_MAX_ROWS = max_rows
+            print(f"  {label}:")
+            ok &= await check(service, queries, expected, args.user_documents, args.k)
+        vector_db_service.VECTOR_EXACT_SCAN_MAX_ROWS = exact_max_rows
+        await service.close()
+
+    if not args.keep:
+        client.delete_collection(COLLECTION)
+    print("OK" if ok else "FAILED")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+Check: assessment generations must not stall the rest of the API.
+
+Serves a small app on a local uvicorn server with the real
+LLMService.generate_assessment behind POST /generate (through
+run_until_disconnect, like the assessments endpoint) and GET /health. The
+model is a fake that answers after --delay seconds, so no Gemini key is
+needed. Then:
+  1. measures /health latency alone, and while --concurrent generations run,
+  2. checks a generation slower than the deadline is cut off with a 504
+     from LLMService (POST /assessments does not return that status: it
+     records the assessment as failed with the timeout message),
+  3. checks a client that disconnects cancels its generation.
+--blocking makes the fake sleep synchronously (what the old
+generate_content call did) to show the check failing.
+
+Usage (from backend/):
+    python -m scripts.check_llm_concurrency [--concurrent 8] [--delay 3]
+        [--timeout 2] [--blocking]
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+from app.api.cancellation import run_until_disconnect
+from app.api.health import router as health_router
+from app.services.llm_service import LLMService
+
+# /health p99 while generating may exceed the idle p99 by at most this
+MAX_ADDED_LATENCY_MS = 50
+
+RESPONSE = json.dumps(
+    {
+        "title": "Fake",
+        "types": ["multiple-choice"],
+        "difficulty": "easy",
+        "topic": "fake",
+        "questions": [
+            {
+                "type": "multiple-choice",
+                "question": "?",
+                "numOptions": 2,
+                "options": ["a", "b"],
+                "correctAnswer": 0,
+                "source_text": "",
+                "page_number": 1,
+                "document_id": "00000000-0000-0000-0000-000000000000",
+            }
+        ],
+    }
+)
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; answers after `delay` seconds."""
+
+    def __init__(self, delay: float, blocking: bool):
+        self.delay = delay
+        self.blocking = blocking
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, request_options=None):
+        try:
+            if self.blocking:
+                time.sleep(self.delay)
+            else:
+                await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return SimpleNamespace(text=RESPONSE)
+
+
+def build_app(llm: LLMService) -> FastAPI:
+    app = FastAPI()
+    app.include_router(health_router)
+
+    @app.post("/generate")
+    async def generate(request: Request, delay: float | None = None):
+        if delay is not None:
+            llm.model.delay = delay
+        result = await run_until_disconnect(
+            request, llm.generate_assessment("fake", "context", 1, "easy", ["multiple-choice"])
+        )
+        return {"questions": len(result.questions)}
+
+    return app
+
+
+def serve(app: FastAPI) -> tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def health_latencies(client: httpx.AsyncClient, until: asyncio.Future | float) -> list[float]:
+    timings = []
+    while not (until.done() if isinstance(until, asyncio.Future) else time.monotonic() > until):
+        started = time.perf_counter()
+        await client.get("/health")
+        timings.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.02)
+    return timings
+
+
+def summary(timings: list[float]) -> str:
+    return (
+        f"n={len(timings)} p50={np.percentile(timings, 50):.1f}ms "
+        f"p99={np.percentile(timings, 99):.1f}ms max={max(timings):.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrent", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=3)
+    parser.add_argument("--timeout", type=float, default=2, help="LLM deadline for step 2")
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    model = FakeModel(args.delay, args.blocking)
+    llm = LLMService(model=model, timeout=max(args.delay * 2, args.timeout))
+    server, base_url = serve(build_app(llm))
+    ok = True
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await client.get("/health")  # connect
+        idle = await health_latencies(client, time.monotonic() + 1)
+        print(f"/health idle:            {summary(idle)}")
+
+        started = time.perf_counter()
+        generations = asyncio.gather(
+            *(client.post("/generate") for _ in range(args.concurrent))
+        )
+        busy = await health_latencies(client, generations)
+        responses = await generations
+        elapsed = time.perf_counter() - started
+        print(f"/health during {args.concurrent} gens: {summary(busy)}")
+        print(
+            f"{args.concurrent} generations of {args.delay}s finished in {elapsed:.1f}s, "
+            f"statuses {sorted({r.status_code for r in responses})}"
+        )
+        added = np.percentile(busy, 99) - np.percentile(idle, 99)
+        if added > MAX_ADDED_LATENCY_MS or elapsed > args.delay * 1.5:
+            print(f"FAIL: generations block the event loop (+{added:.0f}ms p99)")
+            ok = False
+
+        if not args.blocking:
+            llm.timeout = args.timeout
+            response = await client.post("/generate", params={"delay": args.timeout * 2})
+            print(f"generation past the {args.timeout}s deadline: HTTP {response.status_code}")
+            ok &= response.status_code == 504
+            llm.timeout = args.delay * 2
+
+            before = model.cancelled
+            try:
+                await client.post("/generate", params={"delay": 30}, timeout=1)
+            except httpx.ReadTimeout:
+                pass
+            await asyncio.sleep(0.5)
+            print(f"client disconnected after 1s: generation cancelled={model.cancelled > before}")
+            ok &= model.cancelled > before
+
+    server.should_exit = True
+    print("OK" if ok else "FAILED")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
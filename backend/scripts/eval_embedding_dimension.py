@@ -0,0 +1,104 @@
+"""
+Evaluation: retrieval recall lost by Matryoshka truncation.
+
+Loads a sample of stored 768-dim chunk vectors and, for each truncated
+dimension, measures recall@k of exact cosine search against the full-size
+ranking. Queries are other stored chunks (excluding themselves) and,
+optionally, real topic strings embedded as search queries.
+
+Usage (from backend/):
+    python -m scripts.eval_embedding_dimension [--sample 20000] [--k 10]
+        [--topics "recursion,hash tables,graph traversal"]
+"""
+import argparse
+import os
+
+import numpy as np
+import vecs
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+
+from app.utils.embedding_dimension import (
+    EMBEDDING_FULL_DIMENSION,
+    chunk_collection_name,
+    truncate_embeddings,
+)
+
+load_dotenv()
+
+DIMENSIONS = [512, 256, 128, 64]
+
+
+def load_vectors(sample: int) -> np.ndarray:
+    client = vecs.create_client(os.getenv("DATABASE_URL"))
+    collection = client.get_or_create_collection(
+        name=chunk_collection_name(EMBEDDING_FULL_DIMENSION),
+        dimension=EMBEDDING_FULL_DIMENSION,
+    )
+    table = collection.table
+    with client.Session() as sess:
+        rows = sess.execute(
+            select(table.c.vec).order_by(text("random()")).limit(sample)
+        ).fetchall()
+    return np.asarray([list(row[0]) for row in rows], dtype=np.float32)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int, exclude_self: bool) -> np.ndarray:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    if exclude_self:
+        np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(expected: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / expected.size
+
+
+def embed_topics(topics: list[str]) -> np.ndarray:
+    # full-size query embeddings, straight from the API
+    from app.services.embedding_service import EMBEDDING_MODEL
+    from langchain_nomic import NomicEmbeddings
+
+    model = NomicEmbeddings(model=EMBEDDING_MODEL, nomic_api_key=os.getenv("NOMIC_API_KEY"))
+    return np.asarray([model.embed_query(topic) for topic in topics], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--topics", type=str, default="")
+    args = parser.parse_args()
+
+    corpus = load_vectors(args.sample)
+    n_queries = min(args.queries, len(corpus))
+    print(f"Loaded {len(corpus)} chunk vectors; {n_queries} chunk queries, k={args.k}")
+
+    # chunk-to-chunk queries: the first n_queries rows of the (random) sample
+    expected = top_k(corpus, corpus[:n_queries], args.k, exclude_self=True)
+
+    topic_queries = None
+    if args.topics:
+        topic_queries = embed_topics([t.strip() for t in args.topics.split(",") if t.strip()])
+        topic_expected = top_k(corpus, topic_queries, args.k, exclude_self=False)
+
+    print(f"{'dim':>5} {'bytes/vec':>10} {'recall@k chunks':>16} {'recall@k topics':>16}")
+    print(f"{EMBEDDING_FULL_DIMENSION:>5} {EMBEDDING_FULL_DIMENSION * 4:>10} {1.0:>16.3f} {1.0 if topic_queries is not None else float('nan'):>16.3f}")
+    for dim in DIMENSIONS:
+        truncated = np.asarray(truncate_embeddings(corpus.tolist(), dim), dtype=np.float32)
+        found = top_k(truncated, truncated[:n_queries], args.k, exclude_self=True)
+        topic_recall = float("nan")
+        if topic_queries is not None:
+            truncated_topics = np.asarray(truncate_embeddings(topic_queries.tolist(), dim), dtype=np.float32)
+            topic_recall = recall(
+                topic_expected, top_k(truncated, truncated_topics, args.k, exclude_self=False)
+            )
+        print(f"{dim:>5} {dim * 4:>10} {recall(expected, found):>16.3f} {topic_recall:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
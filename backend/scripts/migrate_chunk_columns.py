@@ -0,0 +1,210 @@
+"""
+Migration: typed document_id / file_hash / page_number / chunk_index columns
+on the chunk table, optionally hash-partitioned by document.
+
+Default (in place):
+  1. adds the four columns (nullable, so no table rewrite),
+  2. backfills them from the JSONB metadata in keyset batches of --batch rows,
+  3. replaces the metadata document_id index with one on the column.
+  Safe to re-run: only rows whose document_id is still NULL are updated.
+
+--partitions N:
+  copies the chunks into a new table PARTITION BY HASH (document_id) with N
+  partitions and swaps it in, keeping the old table as
+  <name>_unpartitioned for rollback. Queries filtered to a set of
+  documents then only scan the partitions holding them. Stop the ingestion
+  worker while this runs; rows written during the copy are picked up by
+  the final swap, which locks the old table.
+
+Deploy the backend first (it detects the columns at startup), run this,
+then restart the API and worker so new chunks fill the columns. Re-run the
+in-place backfill once more after the restart to catch rows written in
+between. Indexes are (re)built with the configured HNSW parameters.
+
+Usage (from backend/):
+    python -m scripts.migrate_chunk_columns [--batch 5000] [--partitions 16]
+"""
+import argparse
+import os
+import time
+
+import vecs
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app.services.vector_db_service import VectorDBService
+from app.utils.embedding_dimension import EMBEDDING_DIMENSION, chunk_collection_name
+
+load_dotenv()
+
+TYPED_COLUMN_VALUES = """
+    (metadata->>'document_id')::uuid,
+    metadata->>'file_hash',
+    (metadata->>'page_number')::int,
+    (metadata->>'chunk_index')::int
+"""
+
+
+def add_columns(client: vecs.Client, table: str):
+    with client.Session() as sess:
+        with sess.begin():
+            sess.execute(
+                text(
+                    f"""
+                    alter table vecs."{table}"
+                      add column if not exists document_id uuid,
+                      add column if not exists file_hash text,
+                      add column if not exists page_number integer,
+                      add column if not exists chunk_index integer
+                    """
+                )
+            )
+
+
+def backfill(client: vecs.Client, table: str, batch: int) -> int:
+    """Fills the typed columns from metadata, one short transaction per batch."""
+    updated = 0
+    last_id = ""
+    while True:
+        with client.Session() as sess:
+            with sess.begin():
+                ids = sess.execute(
+                    text(
+                        f"""
+                        with batch as (
+                          select id from vecs."{table}"
+                          where id > :last_id and document_id is null
+                          order by id
+                          limit :batch
+                        )
+                        update vecs."{table}" c
+                        set (document_id, file_hash, page_number, chunk_index) =
+                            ({TYPED_COLUMN_VALUES})
+                        from batch
+                        where c.id = batch.id
+                        returning c.id
+                        """
+                    ),
+                    {"last_id": last_id, "batch": batch},
+                ).scalars().all()
+        if not ids:
+            return updated
+        updated += len(ids)
+        last_id = max(ids)
+        print(f"Backfilled {updated} chunks...")
+
+
+def copy_missing(sess, source: str, target: str, last_id: str, batch: int | None) -> list[str]:
+    """Copies source rows not yet in target (after last_id, up to batch rows)."""
+    return sess.execute(
+        text(
+            f"""
+            insert into vecs."{target}"
+              (id, vec, metadata, document_id, file_hash, page_number, chunk_index)
+            select id, vec, metadata, {TYPED_COLUMN_VALUES}
+            from vecs."{source}" s
+            where s.id > :last_id
+              and not exists (select 1 from vecs."{target}" t where t.id = s.id)
+            order by s.id
+            {"limit :batch" if batch else ""}
+            on conflict do nothing
+            returning id
+            """
+        ),
+        {"last_id": last_id, "batch": batch},
+    ).scalars().all()
+
+
+def partition_table(client: vecs.Client, table: str, dimension: int, partitions: int, batch: int) -> int:
+    """Copies `table` into a hash-partitioned table and swaps it in."""
+    target = f"{table}_partitioned"
+    with client.Session() as sess:
+        with sess.begin():
+            sess.execute(
+                text(
+                    f"""
+                    create table if not exists vecs."{target}" (
+                      id text not null,
+                      vec vector({dimension}) not null,
+                      metadata jsonb not null default '{{}}'::jsonb,
+                      document_id uuid not null,
+                      file_hash text,
+                      page_number integer,
+                      chunk_index integer,
+                      primary key (id, document_id)
+                    ) partition by hash (document_id)
+                    """
+                )
+            )
+            for remainder in range(partitions):
+                # leading underscore: vecs does not list these as collections
+                sess.execute(
+                    text(
+                        f"""
+                        create table if not exists vecs."_{table}_p{remainder}"
+                          partition of vecs."{target}"
+                          for values with (modulus {partitions}, remainder {remainder})
+                        """
+                    )
+                )
+
+    copied = 0
+    last_id = ""
+    while True:
+        with client.Session() as sess:
+            with sess.begin():
+                ids = copy_missing(sess, table, target, last_id, batch)
+        if not ids:
+            break
+        copied += len(ids)
+        last_id = max(ids)
+        print(f"Copied {copied} chunks...")
+
+    with client.Session() as sess:
+        with sess.begin():
+            sess.execute(text(f'lock table vecs."{table}" in exclusive mode'))
+            copied += len(copy_missing(sess, table, target, "", None))
+            # index names are per schema; free them for the new table's indexes
+            old_indexes = sess.execute(
+                text(
+                    "select indexname from pg_indexes "
+                    "where schemaname = 'vecs' and tablename = :table and indexname like 'ix\\_%'"
+                ),
+                {"table": table},
+            ).scalars().all()
+            for index in old_indexes:
+                sess.execute(text(f'alter index vecs."{index}" rename to "{index[:50]}_old"'))
+            sess.execute(text(f'alter table vecs."{table}" rename to "{table}_unpartitioned"'))
+            sess.execute(text(f'alter table vecs."{target}" rename to "{table}"'))
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--partitions", type=int, default=0)
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    client = vecs.create_client(db_url)
+    table = chunk_collection_name(EMBEDDING_DIMENSION)
+
+    started = time.perf_counter()
+    if args.partitions:
+        copied = partition_table(client, table, EMBEDDING_DIMENSION, args.partitions, args.batch)
+        print(
+            f"Moved {copied} chunks into {args.partitions} partitions in "
+            f"{time.perf_counter() - started:.1f}s; the old table is vecs.{table}_unpartitioned"
+        )
+    else:
+        add_columns(client, table)
+        updated = backfill(client, table, args.batch)
+        print(f"Backfilled {updated} chunks in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    status = VectorDBService(db_url).rebuild_indexes()
+    print(f"Built indexes in {time.perf_counter() - started:.1f}s: {status}")
+
+
+if __name__ == "__main__":
+    main()
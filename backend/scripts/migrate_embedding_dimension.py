@@ -0,0 +1,127 @@
+"""
+Migration: copy document chunks into a collection at a smaller Matryoshka
+dimension (e.g. 256 or 512), without calling the embedding API again.
+
+Every stored 768-dim vector is truncated and renormalized exactly like new
+embeddings are (app.utils.embedding_dimension.truncate_embeddings), so the
+copied vectors match what ingestion would produce at that dimension.
+Afterwards it reports table size, index build time and query latency for
+the source and target collections.
+
+Usage (from backend/):
+    python -m scripts.migrate_embedding_dimension --dimension 256 [--create-index]
+
+Then set EMBEDDING_DIMENSION=256 for the API and the worker and restart them.
+New uploads go to the new collection only; see
+supabase/embedding_dimension_migration.sql for the trash cleanup job.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import vecs
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+
+from app.utils.embedding_dimension import (
+    EMBEDDING_FULL_DIMENSION,
+    chunk_collection_name,
+    truncate_embeddings,
+)
+
+load_dotenv()
+
+
+def table_size(client: vecs.Client, collection) -> str:
+    with client.Session() as sess:
+        return sess.execute(
+            text("select pg_size_pretty(pg_total_relation_size(:name))"),
+            {"name": f'vecs."{collection.name}"'},
+        ).scalar()
+
+
+def copy_rows(client: vecs.Client, source, target, dimension: int, batch: int) -> int:
+    """Keyset-paginates the source table and upserts truncated copies."""
+    table = source.table
+    copied = 0
+    last_id = ""
+    while True:
+        with client.Session() as sess:
+            rows = sess.execute(
+                select(table.c.id, table.c.vec, table.c["metadata"])
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch)
+            ).fetchall()
+        if not rows:
+            return copied
+
+        vectors = truncate_embeddings([list(row[1]) for row in rows], dimension)
+        target.upsert(
+            records=[(row[0], vec, row[2]) for row, vec in zip(rows, vectors)]
+        )
+        copied += len(rows)
+        last_id = rows[-1][0]
+        print(f"Copied {copied} chunks...")
+
+
+def query_latency_ms(collection, queries: list[list[float]], limit: int = 10) -> float:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        collection.query(data=query, limit=limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def sample_vectors(client: vecs.Client, collection, n: int) -> list[list[float]]:
+    table = collection.table
+    with client.Session() as sess:
+        rows = sess.execute(
+            select(table.c.vec).order_by(text("random()")).limit(n)
+        ).fetchall()
+    return [list(row[0]) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimension", type=int, required=True, choices=[64, 128, 256, 512])
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--create-index", action="store_true")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    client = vecs.create_client(os.getenv("DATABASE_URL"))
+    source = client.get_or_create_collection(
+        name=chunk_collection_name(EMBEDDING_FULL_DIMENSION),
+        dimension=EMBEDDING_FULL_DIMENSION,
+    )
+    target = client.get_or_create_collection(
+        name=chunk_collection_name(args.dimension), dimension=args.dimension
+    )
+
+    started = time.perf_counter()
+    copied = copy_rows(client, source, target, args.dimension, args.batch)
+    print(f"Copied {copied} chunks to {target.name} in {time.perf_counter() - started:.1f}s")
+
+    if args.create_index:
+        started = time.perf_counter()
+        target.create_index(measure=vecs.IndexMeasure.cosine_distance, replace=True)
+        print(f"Built index on {target.name} in {time.perf_counter() - started:.1f}s")
+
+    queries = sample_vectors(client, source, args.queries)
+    random.shuffle(queries)
+    truncated = truncate_embeddings(queries, args.dimension)
+
+    print(f"{'collection':>24} {'size':>10} {'median query (ms)':>18}")
+    for collection, collection_queries in ((source, queries), (target, truncated)):
+        print(
+            f"{collection.name:>24} {table_size(client, collection):>10} "
+            f"{query_latency_ms(collection, collection_queries):>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
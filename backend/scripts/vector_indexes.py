@@ -0,0 +1,49 @@
+"""
+Admin: reports or rebuilds the chunk table's vector indexes.
+
+status (default) prints VectorDBService.index_status(): the HNSW index of
+the configured VECTOR_STORAGE_FORMAT with its build parameters, and the
+document_id index.
+
+--rebuild rebuilds both with the configured VECTOR_INDEX_M /
+VECTOR_INDEX_EF_CONSTRUCTION (see VectorDBService.rebuild_indexes). The
+build is concurrent, so the API and worker keep querying and writing while
+it runs; they are told to drop cached retrievals once the new index is in
+place. Needs DATABASE_URL with rights to create indexes on the vecs schema.
+
+Usage (from backend/):
+    python -m scripts.vector_indexes [--rebuild]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from app.services.vector_db_service import VectorDBService
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    service = VectorDBService(db_url=os.getenv("DATABASE_URL"))
+    try:
+        if args.rebuild:
+            started = time.perf_counter()
+            status = service.rebuild_indexes()
+            print(f"Rebuilt in {time.perf_counter() - started:.1f}s")
+        else:
+            status = service.index_status()
+        print(json.dumps(status, indent=2))
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
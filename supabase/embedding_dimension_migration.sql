@@ -0,0 +1,37 @@
+-- ============================================================
+-- EMBEDDING DIMENSION MIGRATION
+-- Run this in your Supabase SQL Editor (Dashboard → SQL Editor)
+-- after copying chunks into a smaller collection with:
+--   python -m scripts.migrate_embedding_dimension --dimension 256
+-- and switching the backend and worker to EMBEDDING_DIMENSION=256.
+--
+-- Replace 256 below if you migrated to a different dimension.
+-- ============================================================
+
+-- 1. The trash-auto-delete job (trash_migration.sql) deletes vectors from
+--    vecs.document_chunks only. Sweep the new collection for chunks whose
+--    document row is gone, right after that job runs (02:00 UTC).
+SELECT cron.schedule(
+  'trash-auto-delete-vectors-256',
+  '15 2 * * *',
+  $cron$
+  DELETE FROM vecs.document_chunks_256 AS c
+  WHERE NOT EXISTS (
+    SELECT 1
+    FROM documents d
+    WHERE d.id::text = c.metadata->>'document_id'
+  );
+  $cron$
+);
+
+-- 2. Once the new collection is in use and verified, the full-size copy can
+--    be dropped to reclaim its space (the embedding store keeps full-size
+--    vectors separately, in vecs.chunk_embeddings).
+-- DROP TABLE vecs.document_chunks;
+
+-- ============================================================
+-- VERIFY (optional)
+-- ============================================================
+-- SELECT count(*) FROM vecs.document_chunks_256;
+-- SELECT pg_size_pretty(pg_total_relation_size('vecs.document_chunks'))     AS full_size,
+--        pg_size_pretty(pg_total_relation_size('vecs.document_chunks_256')) AS truncated_size;
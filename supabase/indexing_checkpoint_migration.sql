@@ -0,0 +1,19 @@
+-- ============================================================
+-- RESUMABLE INDEXING CHECKPOINT MIGRATION
+-- Run this in your Supabase SQL Editor (Dashboard → SQL Editor)
+-- ============================================================
+
+-- indexed_chunks: high-water mark — chunks [0, indexed_chunks) are committed to
+--                 vecs.document_chunks as "{file_hash}_{index}".
+-- chunk_count / chunk_digest: identify the chunking the checkpoint belongs to,
+--                 so a retry only resumes when it produces the same chunks.
+ALTER TABLE documents
+  ADD COLUMN IF NOT EXISTS indexed_chunks INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS chunk_count INT NULL,
+  ADD COLUMN IF NOT EXISTS chunk_digest TEXT NULL;
+
+-- ============================================================
+-- VERIFY (optional)
+-- ============================================================
+-- SELECT id, status, indexed_chunks, chunk_count FROM documents
+--   WHERE status <> 'ready';
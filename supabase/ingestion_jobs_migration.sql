@@ -0,0 +1,83 @@
+-- ============================================================
+-- INGESTION JOB QUEUE MIGRATION
+-- Run this in your Supabase SQL Editor (Dashboard → SQL Editor)
+-- ============================================================
+
+-- 1. Job table: one row per ingestion attempt cycle for a document
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+  id               UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  document_id      UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+  status           TEXT NOT NULL DEFAULT 'queued'
+                   CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+  attempts         INT NOT NULL DEFAULT 0,
+  max_attempts     INT NOT NULL DEFAULT 5,
+  run_after        TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  leased_by        TEXT NULL,
+  lease_expires_at TIMESTAMPTZ NULL,
+  last_error       TEXT NULL,
+  created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- At most one active (queued or running) job per document
+CREATE UNIQUE INDEX IF NOT EXISTS ingestion_jobs_active_document
+  ON ingestion_jobs (document_id)
+  WHERE status IN ('queued', 'running');
+
+-- Lookups made by the claim function below
+CREATE INDEX IF NOT EXISTS ingestion_jobs_queued_run_after
+  ON ingestion_jobs (run_after)
+  WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS ingestion_jobs_running_lease
+  ON ingestion_jobs (lease_expires_at)
+  WHERE status = 'running';
+
+-- 2. Claim the next runnable job with SKIP LOCKED leasing.
+--    A job is runnable when it is queued and due, or when it is running but
+--    its lease expired (the worker holding it died) — that is lease recovery.
+CREATE OR REPLACE FUNCTION claim_ingestion_job(p_worker_id TEXT, p_lease_seconds INT)
+RETURNS SETOF ingestion_jobs
+LANGUAGE sql
+AS $$
+  UPDATE ingestion_jobs AS j
+  SET status = 'running',
+      attempts = j.attempts + 1,
+      leased_by = p_worker_id,
+      lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+      updated_at = NOW()
+  WHERE j.id = (
+    SELECT id
+    FROM ingestion_jobs
+    WHERE (status = 'queued' AND run_after <= NOW())
+       OR (status = 'running' AND lease_expires_at < NOW())
+    ORDER BY run_after
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+  )
+  RETURNING j.*;
+$$;
+
+-- 3. Heartbeat: extend the lease while the worker is still making progress
+CREATE OR REPLACE FUNCTION renew_ingestion_job_lease(
+  p_job_id UUID, p_worker_id TEXT, p_lease_seconds INT
+)
+RETURNS BOOLEAN
+LANGUAGE sql
+AS $$
+  WITH renewed AS (
+    UPDATE ingestion_jobs
+    SET lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        updated_at = NOW()
+    WHERE id = p_job_id
+      AND status = 'running'
+      AND leased_by = p_worker_id
+    RETURNING 1
+  )
+  SELECT EXISTS (SELECT 1 FROM renewed);
+$$;
+
+-- ============================================================
+-- VERIFY (optional)
+-- ============================================================
+-- SELECT status, count(*) FROM ingestion_jobs GROUP BY status;
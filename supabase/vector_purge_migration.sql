@@ -0,0 +1,103 @@
+-- ============================================================
+-- SET-BASED VECTOR PURGE MIGRATION
+-- Run this in your Supabase SQL Editor (Dashboard → SQL Editor)
+-- after trash_migration.sql.
+--
+-- The trash-auto-delete job matched chunks on metadata->>'document_id',
+-- which no index covers. This adds a purge function that deletes the chunks
+-- of many documents in one statement (through the document_id column added
+-- by scripts/migrate_chunk_columns.py, or the metadata index otherwise) and
+-- points the job at it. The backend's bulk purge issues the same DELETE.
+--
+-- If EMBEDDING_DIMENSION is not 768, replace vecs.document_chunks and
+-- 'document_chunks' below with vecs.document_chunks_<dim>.
+-- ============================================================
+
+-- 1. Purge function (in the vecs schema, so it is not exposed over the API)
+CREATE OR REPLACE FUNCTION vecs.purge_document_vectors(document_ids uuid[])
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  deleted bigint;
+BEGIN
+  IF EXISTS (
+    SELECT 1
+    FROM information_schema.columns
+    WHERE table_schema = 'vecs'
+      AND table_name = 'document_chunks'
+      AND column_name = 'document_id'
+  ) THEN
+    -- typed column: btree index / partition pruning
+    DELETE FROM vecs.document_chunks
+    WHERE document_id = ANY(document_ids);
+  ELSE
+    -- same expression as the ix_document_chunks_document_id index
+    DELETE FROM vecs.document_chunks
+    WHERE (metadata -> 'document_id') = ANY(
+      ARRAY(SELECT to_jsonb(id::text) FROM unnest(document_ids) AS id)
+    );
+  END IF;
+
+  GET DIAGNOSTICS deleted = ROW_COUNT;
+  RETURN deleted;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION vecs.purge_document_vectors(uuid[]) FROM PUBLIC;
+
+-- 2. Re-schedule the auto-delete job (same name, so it replaces the old one);
+--    only Step 4 changed.
+SELECT cron.schedule(
+  'trash-auto-delete',
+  '0 2 * * *',
+  $cron$
+  DO $body$
+  DECLARE
+    orphaned_doc_ids TEXT[];
+  BEGIN
+
+    -- Step 1: Delete assessments that expired in trash
+    DELETE FROM assessments
+    WHERE deleted_at IS NOT NULL
+      AND deleted_at < NOW() - INTERVAL '30 days';
+
+    -- Step 2: Collect document IDs that will become fully orphaned
+    SELECT ARRAY(
+      SELECT DISTINCT ul_trash.document_id
+      FROM user_library ul_trash
+      WHERE ul_trash.deleted_at IS NOT NULL
+        AND ul_trash.deleted_at < NOW() - INTERVAL '30 days'
+        AND NOT EXISTS (
+          SELECT 1
+          FROM user_library ul_active
+          WHERE ul_active.document_id = ul_trash.document_id
+            AND ul_active.deleted_at IS NULL
+        )
+    ) INTO orphaned_doc_ids;
+
+    -- Step 3: Delete expired user_library (trash) entries
+    DELETE FROM user_library
+    WHERE deleted_at IS NOT NULL
+      AND deleted_at < NOW() - INTERVAL '30 days';
+
+    -- Step 4: Delete vector embeddings for now-orphaned documents (one statement)
+    IF orphaned_doc_ids IS NOT NULL AND array_length(orphaned_doc_ids, 1) > 0 THEN
+      PERFORM vecs.purge_document_vectors(orphaned_doc_ids::uuid[]);
+    END IF;
+
+    -- Step 5: Delete the now-orphaned document records
+    DELETE FROM documents
+    WHERE id = ANY(orphaned_doc_ids::uuid[]);
+
+  END;
+  $body$;
+  $cron$
+);
+
+-- ============================================================
+-- VERIFY (optional)
+-- ============================================================
+-- SELECT jobname, schedule, command FROM cron.job WHERE jobname = 'trash-auto-delete';
+-- EXPLAIN DELETE FROM vecs.document_chunks
+--   WHERE document_id = ANY('{00000000-0000-0000-0000-000000000000}'::uuid[]);